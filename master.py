@@ -2,27 +2,32 @@
 # Distributed Torrent Client - Entry Point (master.py)
 # ============================
 
-import bencodepy      # For decoding and encoding .torrent files (bencoded format)
 import sys            # For handling command-line arguments and system exits
-import threading      # For running peer discovery and download in parallel threads
-import queue          # For thread-safe peer queue management
-import hashlib        # For generating SHA-1 hash of torrent info (info_hash)
 import os             # For file and directory operations
 import time           # For timestamps and delays
 import asyncio        # For asynchronous peer communication
+from bitarray.util import zeros  # For allocating the verified-pieces bitmap
+
+try:
+    import uvloop     # Optional libuv-based event loop, faster for socket-heavy workloads
+except ImportError:
+    uvloop = None
 
 # Importing internal utility modules
 from utils.get_peers import *       # Functions to query trackers and fetch peers
 from utils.download import *        # Functions to manage downloading from peers
 from utils.json_data import ResumeData  # Class to manage saving and loading resume state
 from utils.details import TorrentDetails # Class to parse and manage torrent metadata
+from utils.get_details import get_info_hash, TorrentParseError  # Info hash and metadata errors
 from utils.logger import Logger         # Logger for stats and progress updates
+import utils.bencoding as bencode       # Bencode decoder/encoder (C-accelerated when available)
 
 # Constant for resume file name used to store download progress
 RESUME_FILENAME = "resume.json"
 
-# Thread-safe queue to store peers fetched from tracker
-peers_list = queue.Queue()
+# Use uvloop for every event loop created by asyncio.run when it is installed
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 # Initialize logger and start displaying download stats in background
 logger = Logger()
@@ -31,31 +36,48 @@ logger.display_stats_loop()
 # ------------------------------------------
 # Function: populate_peers
 # Description:
-#   Periodically contacts the tracker, retrieves a peer list,
-#   and pushes peers into the shared queue for the downloader.
+#   Periodically contacts the trackers and hands every peer
+#   to the connection workers as soon as it is received.
 # ------------------------------------------
-def populate_peers(torrent_info: dict, info_hash: bytes, logger: Logger):
+async def populate_peers(torrent_info: dict, info_hash: bytes, logger: Logger,
+                         peer_queue: asyncio.Queue, queued_peers: set):
+    def push_peer(peer: tuple):
+        enqueue_peer(peer_queue, queued_peers, peer)
+
     while True:
-        # Fetch fresh peer list from the tracker and put into peers_list queue
-        get_peers_list(torrent_info, info_hash, peers_list, logger)
-        # Retrieve tracker interval and swarm stats (seeders/leechers)
-        [Interval, Seeder, Leecher] = get_interval_data()
-        print(f"Interval:{Interval}, Seeders:{Seeder}, Leechers:{Leecher}")
+        # Fetch fresh peers from all trackers concurrently, streaming them to the connection workers
+        swarm_by_tracker = await get_peers_list(torrent_info, info_hash, push_peer, logger)
+        # Combine tracker interval and swarm stats (seeders/leechers) across trackers
+        swarm = get_interval_data(swarm_by_tracker)
+        logger.info(f"Interval:{swarm.interval}, Seeders:{swarm.seeders}, Leechers:{swarm.leechers}")
         # Sleep until next tracker interval
-        time.sleep(Interval + 1)
+        await asyncio.sleep(swarm.interval + 1)
 
 # ------------------------------------------
 # Function: connect_to_peers
 # Description:
-#   Consumes peers from the queue and starts asynchronous
-#   connections to download pieces of the torrent.
+#   Runs the tracker announces and the download pipeline
+#   on a single long-lived event loop.
 # ------------------------------------------
-def connect_to_peers(details: TorrentDetails, resume_data: ResumeData, logger: Logger):
-    while True:
-        # Get next peer from the queue
-        peers = peers_list.get()
-        # Asynchronously start the downloading process with selected peers
-        asyncio.run(main(peers, details, resume_data, logger))
+async def connect_to_peers(torrent_info: dict, info_hash: bytes, details: TorrentDetails,
+                           resume_data: ResumeData, logger: Logger):
+    # Bounded, so a flood of peers from the tracker cannot grow memory without limit
+    peer_queue = asyncio.Queue(maxsize=PEER_QUEUE_SIZE)
+    queued_peers = set()    # (ip, port) of the peers waiting in peer_queue, to skip duplicates
+
+    # Tracker task runs alongside the workers on the same loop
+    tracker_task = asyncio.create_task(populate_peers(torrent_info, info_hash, logger, peer_queue, queued_peers))
+
+    # Workers stay alive across tracker refreshes, so connections persist
+    pipeline_task = asyncio.create_task(main(peer_queue, queued_peers, details, resume_data, logger))
+
+    # If either task fails (e.g. the torrent has no usable tracker list), stop both
+    try:
+        await asyncio.gather(tracker_task, pipeline_task)
+    finally:
+        tracker_task.cancel()
+        pipeline_task.cancel()
+        await asyncio.gather(tracker_task, pipeline_task, return_exceptions=True)
 
 # ------------------------------------------
 # Main Entry Point
@@ -83,16 +105,17 @@ if __name__ == "__main__":
 
     # Step 2: Decode the torrent metadata using bencode
     try:
-        torrent_info = bencodepy.decode(file_content)
+        torrent_info = bencode.decode(file_content)
     except Exception as E:
         print(f"Error : {E}")
         sys.exit(1)
 
     # Step 3: Extract info dictionary and generate info_hash
+    # The hash is taken over the raw info bytes in the file, so no re-encoding is needed
     try:
         info_dict = torrent_info[b'info']
-        info_bencoded = bencodepy.encode(info_dict)
-        info_hash = hashlib.sha1(info_bencoded).digest()
+        info_start, info_end = bencode.find_value_span(file_content, b'info')
+        info_hash = get_info_hash(memoryview(file_content)[info_start:info_end])
     except Exception as E:
         print(f"Error : {E}")
         sys.exit(1)
@@ -107,17 +130,31 @@ if __name__ == "__main__":
     dir_path = dir_path + '/'
 
     # Create torrent details object
-    details = TorrentDetails(info_dict, dir_path)
+    try:
+        details = TorrentDetails(info_dict, dir_path, info_hash)
+    except TorrentParseError as E:
+        print(f"Error : {E}")
+        sys.exit(1)
 
     # Step 5: Setup resume data and ensure download directory exists
     try:
         os.makedirs(dir_path, exist_ok=True)
+        details.open_files()
         json_file_path = os.path.join(dir_path, RESUME_FILENAME)
 
+        resume_data = None
         if RESUME_FILENAME in os.listdir(dir_path):
             # Load existing resume state to continue download
-            resume_data = ResumeData.from_json(json_file_path)
-        else:
+            try:
+                resume_data = ResumeData.from_json(json_file_path)
+                if resume_data.total_pieces != details.num_of_pieces:
+                    raise ValueError(f"it has {resume_data.total_pieces} pieces, expected {details.num_of_pieces}")
+            except (ValueError, TypeError) as E:
+                # Truncated or stale resume file: ignore it rather than fail every peer later
+                logger.warn(f"Ignoring invalid resume file ({E}), starting fresh")
+                resume_data = None
+
+        if resume_data is None:
             # Create a fresh resume state for a new download
             resume_data = ResumeData(
                 info_hash=details.info_hash.hex(),
@@ -126,28 +163,30 @@ if __name__ == "__main__":
                 downloaded=0,
                 file_sizes=details.file_sizes,
                 mtime=int(time.time()),
-                verified_pieces=[False for _ in range(details.num_of_pieces)],
+                verified_pieces=zeros(details.num_of_pieces),
                 last_active=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
             )
     except Exception as E:
         print(f"Error : {type(E).__name__} {E}")
         sys.exit(1)
 
-    # Step 6: Start tracker thread and peer connector thread
-    try:
-        # Thread for periodically populating peers from tracker
-        tracker_thread = threading.Thread(target=populate_peers, args=(torrent_info, info_hash, logger))
-        # Thread for connecting to peers and downloading
-        connector_thread = threading.Thread(target=connect_to_peers, args=(details, resume_data, logger))
-
-        tracker_thread.start()
-        connector_thread.start()
+    # Start the progress display from the pieces already verified in a previous session
+    logger.update_stats(resume_data.verified_count, details.num_of_pieces)
 
-        tracker_thread.join()
-        connector_thread.join()
+    # Step 6: Run the tracker announces and the peer event loop
+    try:
+        asyncio.run(connect_to_peers(torrent_info, info_hash, details, resume_data, logger))
 
     # Step 7: Graceful shutdown on keyboard interrupt
     except KeyboardInterrupt:
         print("Exiting. Saving resume data.")
         resume_data.to_json(json_file_path)
+        details.close_files()
         sys.exit(0)
+
+    # Unusable torrent metadata found while contacting the trackers
+    except TorrentParseError as E:
+        print(f"Error : {E}. Saving resume data.")
+        resume_data.to_json(json_file_path)
+        details.close_files()
+        sys.exit(1)
@@ -0,0 +1,147 @@
+# -------------------------------
+# Bencode Backend Selection
+# -------------------------------
+# Prefers the C-accelerated `better_bencode` extension for decoding and
+# encoding .torrent metadata, and falls back to the pure-Python `bencodepy`
+# package when the extension is not installed or not usable on this
+# interpreter. Both backends return dicts keyed by bytes and encode dict
+# keys in sorted order, as required by BEP 3, so the info_hash computed
+# from either one is identical.
+
+_PROBE = b'd4:infod6:lengthi1e4:name1:aee'  # Tiny torrent used to self-test the C backend
+
+try:
+    import better_bencode
+
+    # Some builds of the extension fail at call time on newer Python versions,
+    # so make sure a round trip actually works before selecting it.
+    if better_bencode.dumps(better_bencode.loads(_PROBE)) != _PROBE:
+        raise ImportError("better_bencode round trip mismatch")
+
+    decode = better_bencode.loads    # C extension: bencoded bytes -> Python objects
+    encode = better_bencode.dumps    # C extension: Python objects -> bencoded bytes
+except Exception:
+    import bencodepy
+
+    decode = bencodepy.decode        # Pure-Python fallback decoder
+    encode = bencodepy.encode        # Pure-Python fallback encoder
+
+
+# -------------------------------
+# Function: _skip_string
+# -------------------------------
+# Walks over one '<length>:<bytes>' string.
+def _skip_string(data: bytes, pos: int) -> int:
+    """
+    Find where the bencoded string starting at `pos` ends.
+
+    Args:
+        data (bytes): Raw bencoded data.
+        pos (int): Offset of the first digit of the string length.
+
+    Returns:
+        int: Offset just past the end of the string.
+
+    Raises:
+        ValueError: If the length is not a non-negative integer or the
+            string runs past the end of the data.
+    """
+    colon = data.index(b':', pos)
+    length = data[pos:colon]
+    # A sign or other non-digit would move `pos` backwards and never terminate
+    if not length.isdigit():
+        raise ValueError(f"Invalid string length at offset {pos}")
+    end = colon + 1 + int(length)
+    if end > len(data):
+        raise ValueError("String runs past end of data")
+    return end
+
+
+# -------------------------------
+# Function: _skip_value
+# -------------------------------
+# Walks over one bencoded value without building any Python objects.
+def _skip_value(data: bytes, pos: int) -> int:
+    """
+    Find where the bencoded value starting at `pos` ends.
+
+    Args:
+        data (bytes): Raw bencoded data.
+        pos (int): Offset of the first byte of the value.
+
+    Returns:
+        int: Offset just past the end of the value.
+
+    Raises:
+        ValueError: If the data is not valid bencode.
+    """
+    depth = 0
+    try:
+        while True:
+            c = data[pos]
+            if c == 0x64 or c == 0x6C:          # 'd' or 'l' opens a container
+                depth += 1
+                pos += 1
+                continue
+            if c == 0x65:                       # 'e' closes a container
+                if depth == 0:
+                    raise ValueError(f"Unexpected end marker at offset {pos}")
+                depth -= 1
+                pos += 1
+            elif c == 0x69:                     # 'i<number>e'
+                pos = data.index(b'e', pos) + 1
+            else:                               # '<length>:<bytes>'
+                pos = _skip_string(data, pos)
+
+            if depth == 0:
+                return pos
+    except IndexError:
+        raise ValueError("Truncated bencoded data")
+
+
+# -------------------------------
+# Function: find_value_span
+# -------------------------------
+# Locates the raw bytes of a top-level dictionary value (e.g. b'info').
+def find_value_span(data: bytes, key: bytes) -> tuple:
+    """
+    Find the byte range of the value stored under `key` in a bencoded dict.
+
+    The info_hash must be computed over the exact bytes of the info dict as
+    they appear in the .torrent file, so slicing them out avoids re-encoding
+    the decoded dictionary.
+
+    Args:
+        data (bytes): Raw bencoded dictionary (the .torrent file contents).
+        key (bytes): Top-level key to look for.
+
+    Returns:
+        tuple: (start, end) offsets such that data[start:end] is the value.
+
+    Raises:
+        KeyError: If the key is not present.
+        ValueError: If the data is not a valid bencoded dictionary.
+    """
+    if data[:1] != b'd':
+        raise ValueError("Bencoded data is not a dictionary")
+
+    pos = 1
+    try:
+        while data[pos] != 0x65:                # Stop at the dict's 'e'
+            key_end = _skip_string(data, pos)
+            key_start = data.index(b':', pos) + 1
+            pos = key_end
+            value_end = _skip_value(data, pos)
+            if data[key_start:pos] == key:
+                return pos, value_end
+            pos = value_end
+    except IndexError:
+        raise ValueError("Truncated bencoded data")
+
+    raise KeyError(key)
+
+
+# -------------------------------
+# Module Export
+# -------------------------------
+__all__ = ["decode", "encode", "find_value_span"]
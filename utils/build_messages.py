@@ -1,11 +1,28 @@
 import struct
-import random
 import socket
 import asyncio
+from bitarray import bitarray
 import utils.details as details
 from utils.details import TorrentDetails, ParsedMessage
 import utils.handlers as handler
 
+READ_CHUNK_SIZE = 65536  # Bytes requested from a peer socket per read
+
+# Fixed messages, packed once at import (<length prefix><message id>)
+KEEP_ALIVE = struct.pack(">I", 0)
+CHOKE = struct.pack(">Ib", 1, 0)
+UNCHOKE = struct.pack(">Ib", 1, 1)
+INTERESTED = struct.pack(">Ib", 1, 2)
+UNINTERESTED = struct.pack(">Ib", 1, 3)
+
+# Pre-compiled packers for the variable messages (avoids re-parsing the format each call)
+_MSG_LEN = struct.Struct(">I")          # Length prefix
+_MSG_HEADER = struct.Struct(">Ib")      # Length prefix + message id
+_HAVE = struct.Struct(">IbI")           # have: piece index
+_REQUEST = struct.Struct(">IbIII")      # request / cancel: index, begin, length
+_PIECE_HDR = struct.Struct(">IbII")     # piece header: index, begin
+_PORT = struct.Struct(">IbH")           # port: listen port
+
 # -------------------------------
 # Function: build_bitTorrent_handshake
 # -------------------------------
@@ -13,19 +30,16 @@ def build_bitTorrent_handshake(details: TorrentDetails):
     """
     Builds the handshake message for the BitTorrent protocol.
 
+    The handshake only depends on the info_hash and the session peer_id,
+    so it is packed once in TorrentDetails and reused for every peer.
+
     Args:
         details (TorrentDetails): Object containing torrent metadata.
 
     Returns:
         bytes: Packed handshake request to send to peers.
     """
-    pstrlen = 19  # Protocol string length
-    pstr = b"BitTorrent protocol"
-    # Generate a random peer_id (mimicking a standard BitTorrent client)
-    peer_id = b'-TR4003-' + bytes(random.getrandbits(8) for _ in range(12))
-    # Pack the handshake request according to the BitTorrent spec
-    handshake_req = struct.pack(">B19s8x20s20s", pstrlen, pstr, details.info_hash, peer_id)
-    return handshake_req
+    return details.handshake
 
 
 # -------------------------------
@@ -33,23 +47,23 @@ def build_bitTorrent_handshake(details: TorrentDetails):
 # -------------------------------
 def build_keep_alive():
     """Build a keep-alive message (used to keep peer connections open)."""
-    return struct.pack(">I", 0)
+    return KEEP_ALIVE
 
 def build_choke():
     """Build a choke message (indicates the peer will not send pieces)."""
-    return struct.pack(">Ib", 1, 0)
+    return CHOKE
 
 def build_unchoke():
     """Build an unchoke message (indicates the peer can send pieces)."""
-    return struct.pack(">Ib", 1, 1)
+    return UNCHOKE
 
 def build_interested():
     """Build an interested message (requesting pieces from the peer)."""
-    return struct.pack(">Ib", 1, 2)
+    return INTERESTED
 
 def build_uninterested():
     """Build an uninterested message (no longer requesting pieces)."""
-    return struct.pack(">Ib", 1, 3)
+    return UNINTERESTED
 
 
 # -------------------------------
@@ -62,29 +76,25 @@ def build_have(piece_index: int):
     Args:
         piece_index (int): Index of the piece that has been downloaded.
     """
-    return struct.pack(">IbI", 5, 4, piece_index)
+    return _HAVE.pack(5, 4, piece_index)
 
-def build_bitfeild(bitfeild: list, details: TorrentDetails):
+def build_bitfeild(bitfeild: bitarray, details: TorrentDetails):
     """
     Build a bitfield message indicating which pieces are already downloaded.
 
     Args:
-        bitfeild (list): Boolean list representing possession of pieces.
+        bitfeild (bitarray): Bitmap representing possession of pieces.
         details (TorrentDetails): Torrent metadata.
 
     Returns:
         bytes: Packed bitfield message.
     """
-    bitfield_length = (details.num_of_pieces + 7) // 8
-    bitfield_bytes = bytearray(bitfield_length)
-
-    # Set bits for pieces we have
-    for i, has_piece in enumerate(bitfeild):
-        if has_piece:
-            bitfield_bytes[i // 8] |= (1 << (7 - (i % 8)))
+    # bitarray is big-endian by default, which matches the wire format
+    # (piece 0 is the high bit of the first byte, spare bits are zero)
+    bitfield_bytes = bitfeild.tobytes()
 
     total_length = 1 + len(bitfield_bytes)
-    return struct.pack(">Ib", total_length, 5) + bytes(bitfield_bytes)
+    return _MSG_HEADER.pack(total_length, 5) + bitfield_bytes
 
 
 # -------------------------------
@@ -99,7 +109,7 @@ def build_request(piece_index: int, begin: int, length: int):
         begin (int): Offset within the piece.
         length (int): Length of the block to download.
     """
-    return struct.pack(">IbIII", 13, 6, piece_index, begin, length)
+    return _REQUEST.pack(13, 6, piece_index, begin, length)
 
 def build_piece(piece_index: int, begin: int, block: bytes):
     """
@@ -112,7 +122,7 @@ def build_piece(piece_index: int, begin: int, block: bytes):
     """
     block_length = len(block)
     total_length = 9 + block_length
-    header = struct.pack(">IbII", total_length, 7, piece_index, begin)
+    header = _PIECE_HDR.pack(total_length, 7, piece_index, begin)
     return header + block
 
 def build_cancel(piece_index: int, begin: int, length: int):
@@ -124,7 +134,7 @@ def build_cancel(piece_index: int, begin: int, length: int):
         begin (int): Offset within the piece.
         length (int): Length of the block.
     """
-    return struct.pack(">IbIII", 13, 8, piece_index, begin, length)
+    return _REQUEST.pack(13, 8, piece_index, begin, length)
 
 
 # -------------------------------
@@ -137,7 +147,7 @@ def build_port(port: int):
     Args:
         port (int): The port number.
     """
-    return struct.pack(">IbH", 3, 9, port)
+    return _PORT.pack(3, 9, port)
 
 
 # -------------------------------
@@ -165,26 +175,97 @@ def recvall(sock: socket.socket, n: int) -> bytes:
         data += part
     return data
 
-async def recv_whole_message(reader: asyncio.StreamReader, isHandshake: bool) -> bytes:
+class FramedReader:
+    """
+    Buffers data from an asyncio.StreamReader and splits it into messages.
+
+    Data is pulled from the stream in large chunks and each message is
+    returned as a memoryview into the received chunk, so reading a message
+    costs no extra reads or copies for its length prefix and payload.
+    The buffer is an immutable bytes object that is replaced (never resized)
+    when more data arrives, so previously returned views stay valid.
+    """
+    def __init__(self, reader: asyncio.StreamReader, chunk_size: int = READ_CHUNK_SIZE):
+        """
+        Args:
+            reader (asyncio.StreamReader): Async IO reader for the connection.
+            chunk_size (int): Number of bytes to request from the stream per read.
+        """
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self.buffer = b''   # Received data not yet fully consumed
+        self.pos = 0        # Offset of the first unread byte in `buffer`
+
+    async def _fill(self, n: int):
+        """
+        Make sure at least `n` unread bytes are buffered.
+
+        Raises:
+            asyncio.IncompleteReadError: If the peer closes the connection first.
+        """
+        available = len(self.buffer) - self.pos
+        if available >= n:
+            return
+
+        if not available:
+            chunk = await self.reader.read(max(self.chunk_size, n))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b'', n)
+            self.buffer = chunk
+            self.pos = 0
+            available = len(chunk)
+            if available >= n:
+                return
+
+        # Part of the message is buffered: fetch the rest with a single
+        # readexactly and join once, instead of re-joining on every TCP segment
+        try:
+            rest = await self.reader.readexactly(n - available)
+        except asyncio.IncompleteReadError as e:
+            raise asyncio.IncompleteReadError(self.buffer[self.pos:] + e.partial, n) from None
+        self.buffer = self.buffer[self.pos:] + rest
+        self.pos = 0
+
+    async def readexactly(self, n: int) -> memoryview:
+        """
+        Read exactly `n` bytes.
+
+        Returns:
+            memoryview: View of the next `n` bytes of the stream.
+        """
+        await self._fill(n)
+        start = self.pos
+        self.pos += n
+        return memoryview(self.buffer)[start:self.pos]
+
+    async def read_message(self) -> memoryview:
+        """
+        Read one length-prefixed message.
+
+        Returns:
+            memoryview: The full message, including its 4-byte length prefix.
+        """
+        await self._fill(4)
+        length = _MSG_LEN.unpack_from(self.buffer, self.pos)[0]
+        return await self.readexactly(4 + length)
+
+async def recv_whole_message(reader: FramedReader, isHandshake: bool) -> memoryview:
     """
     Read an entire message from the peer, handling both handshake and normal messages.
 
     Args:
-        reader (asyncio.StreamReader): Async IO reader for the connection.
+        reader (FramedReader): Buffered reader for the connection.
         isHandshake (bool): Whether this is a handshake message.
 
     Returns:
-        bytes: The full message payload.
+        memoryview: The full message payload.
     """
     if isHandshake:
         # Handshake messages are fixed length (68 bytes)
         message = await reader.readexactly(68)
     else:
-        # Normal messages: first read length prefix, then payload
-        len_bytes = await reader.readexactly(4)
-        length = struct.unpack(">I", len_bytes)[0]
-        payload = await reader.readexactly(length)
-        message = len_bytes + payload
+        # Normal messages: length prefix followed by payload
+        message = await reader.read_message()
     return message
 
 
@@ -201,7 +282,7 @@ def parse_message(packet: bytes) -> ParsedMessage:
     Returns:
         ParsedMessage: Structured message with length, ID, and payload.
     """
-    length = None if len(packet) < 4 else struct.unpack(">I", packet[:4])[0]
-    id = None if len(packet) < 5 else struct.unpack(">b", packet[4:5])[0]
+    length = None if len(packet) < 4 else _MSG_LEN.unpack_from(packet)[0]
+    id = None if len(packet) < 5 else packet[4]   # Indexing bytes yields the id as an int
     payload = None if len(packet) < 6 else packet[5:]
     return ParsedMessage(length, id, payload)
@@ -1,5 +1,11 @@
 # Importing utility functions from the 'utils/get_details' module
 from utils.get_details import *
+import os
+import struct
+
+# Peer ID for this client session (Transmission-style prefix + 12 random bytes).
+# Generated once so trackers and peers see the same ID for the whole session.
+PEER_ID = b'-TR4003-' + os.urandom(12)
 
 # -------------------------------
 # Class: TorrentDetails
@@ -9,13 +15,14 @@ from utils.get_details import *
 # piece hashes, file paths, etc.
 
 class TorrentDetails:
-    def __init__(self, info_dict: dict, root: str):
+    def __init__(self, info_dict: dict, root: str, info_hash: bytes):
         """
         Initializes the TorrentDetails object with extracted metadata.
 
         Args:
             info_dict (dict): Parsed information from the torrent's "info" dictionary.
             root (str): Root directory path where the files will be downloaded.
+            info_hash (bytes): SHA1 hash of the raw "info" section (see `get_info_hash`).
         """
         # Size of each piece in bytes
         self.piece_length = get_piece_length(info_dict)
@@ -33,11 +40,43 @@ class TorrentDetails:
         self.hash_of_pieces = get_hash_list(info_dict, self.num_of_pieces)
 
         # Unique SHA1 hash (info hash) used to identify the torrent
-        self.info_hash = get_info_hash(info_dict)
+        self.info_hash = info_hash
 
         # Details of the files to be downloaded, including paths and sizes
         self.files = get_file_details(info_dict, root)
 
+        # Handshake message sent to every peer (identical for all connections)
+        self.handshake = struct.pack(">B19s8x20s20s", 19, b"BitTorrent protocol", self.info_hash, PEER_ID)
+
+    def open_files(self):
+        """
+        Creates every file of the torrent (and its parent directories) at its
+        final size and keeps a file descriptor open for it in `file['fd']`,
+        so pieces can be written with a single os.pwrite call.
+        """
+        # Create each parent directory once, even when it holds many files
+        created_dirs = set()
+        for file_entry in self.files:
+            file_path = file_entry['path']
+            parent_dir = os.path.dirname(file_path)
+            if parent_dir not in created_dirs:
+                os.makedirs(parent_dir, exist_ok=True)
+                created_dirs.add(parent_dir)
+
+            fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size != file_entry['length']:
+                os.ftruncate(fd, file_entry['length'])
+            file_entry['fd'] = fd
+
+    def close_files(self):
+        """
+        Closes the file descriptors opened by `open_files`.
+        """
+        for file_entry in self.files:
+            fd = file_entry.pop('fd', None)
+            if fd is not None:
+                os.close(fd)
+
 
 # -------------------------------
 # Class: ParsedMessage
@@ -77,10 +116,12 @@ class Peer:
         """
         self.ip = ip
         self.port = port
+        # "ip:port", built once and reused by every log line about this peer
+        self.address = f"{ip}:{port}"
 
     def __str__(self):
         """
         Returns a readable string representation of the Peer.
         Example: '192.168.1.10:6881'
         """
-        return f"{self.ip}:{self.port}"
+        return self.address
@@ -3,8 +3,10 @@
 # =======================
 import asyncio          # For asynchronous networking, queues, and coroutines
 import os               # For file and directory operations
-from typing import List # For type hinting with lists
+from bitarray import bitarray  # For piece availability bitmaps
 import struct           # For packing/unpacking binary data (BitTorrent protocol operations)
+import socket           # For creating and tuning peer TCP sockets
+from concurrent.futures import ThreadPoolExecutor  # For running blocking disk writes off the event loop
 
 # Custom utility modules
 import utils.build_messages as messages       # Handles building protocol messages (handshake, requests, etc.)
@@ -23,12 +25,68 @@ NUM_HANDLE_TASKS = 2    # Number of workers for handling control messages (bitfi
 NUM_DOWNLOAD_TASKS = 8  # Number of workers for downloading pieces (1 worker per peer)
 MAX_CLAIM_PER_PEER = 30 # Max number of pieces claimed at a time per peer
 BLOCK_SIZE = 2**14      # Size (16 KB) of each piece block during download
+MAX_PIPELINE = 16       # Max number of block requests outstanding per peer
+WRITE_QUEUE_SIZE = 64   # Max number of verified pieces waiting to be written to disk
+PEER_QUEUE_SIZE = 1024  # Max number of peers waiting for a connection attempt
+HANDSHAKE_QUEUE_SIZE = NUM_HANDLE_TASKS * 4     # Max number of handshaken connections waiting for a handle worker
+DOWNLOAD_QUEUE_SIZE = NUM_DOWNLOAD_TASKS * 2    # Max number of ready connections waiting for a download worker
+VERIFY_BATCH_SIZE = 4   # Number of pieces from one peer hashed together in parallel
+
+# Fixed send/receive buffer size (bytes) per peer socket, only if this env variable is set.
+# Off by default: setting SO_RCVBUF/SO_SNDBUF turns off Linux TCP buffer autotuning and
+# is clamped to net.core.rmem_max/wmem_max, so it usually ends up smaller than autotuning.
+SOCKET_BUFFER_ENV = "TORRENT_SOCKET_BUFFER"
+SOCKET_BUFFER_SIZE = int(os.environ.get(SOCKET_BUFFER_ENV) or 0)
+
+PIECE_HEADER = struct.Struct(">II")  # Index and begin fields at the start of a PIECE payload
+
+# Single background thread that performs all disk writes, so a slow disk
+# never blocks the asyncio event loop (writes stay serialized in order)
+DISK_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-writer")
+
+# Thread pool for SHA-1 piece verification; hashlib releases the GIL while
+# hashing, so pieces from different peers are verified in parallel with
+# one thread per CPU core
+HASH_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="piece-hasher")
+
+
+# =======================
+# Peer Socket Setup
+# =======================
+async def open_peer_connection(peer: Peer):
+    """
+    Opens a TCP connection to a peer using a socket tuned for bulk downloads.
+
+    Socket buffers are left to kernel autotuning unless SOCKET_BUFFER_SIZE is
+    set; then they are set before connecting, so the TCP window scale agreed
+    in the SYN handshake can make use of them. TCP_NODELAY stops Nagle from
+    holding back our small request messages, and TCP_QUICKACK (Linux only)
+    avoids delayed ACKs on the request path.
+
+    Returns:
+        Tuple[asyncio.StreamReader, asyncio.StreamWriter]: Streams for the connection.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        if SOCKET_BUFFER_SIZE:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        await asyncio.get_running_loop().sock_connect(sock, (peer.ip, peer.port))
+        if hasattr(socket, "TCP_QUICKACK"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+    except BaseException:
+        sock.close()
+        raise
+
+    return await asyncio.open_connection(sock=sock)
 
 
 # =======================
 # Connection Stage Worker
 # =======================
-async def connection_worker(peer_queue: asyncio.Queue, handshake_queue: asyncio.Queue, 
+async def connection_worker(peer_queue: asyncio.Queue, queued_peers: set, handshake_queue: asyncio.Queue,
                             torrent_details: TorrentDetails, logger: CONNECTION_LOGGER):
     """
     Establishes TCP connections to peers and performs the BitTorrent handshake.
@@ -44,21 +102,24 @@ async def connection_worker(peer_queue: asyncio.Queue, handshake_queue: asyncio.
             peer = await peer_queue.get()
         except asyncio.QueueEmpty:
             break
+        # The peer left the queue, so a later announce may queue it again
+        queued_peers.discard((peer.ip, peer.port))
 
         # Attempt TCP connection
         try:
-            logger.tcp_connection_attempt(peer.ip, peer.port)
+            logger.tcp_connection_attempt(peer.address)
             reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(peer.ip, peer.port), timeout=TIMEOUT
+                open_peer_connection(peer), timeout=TIMEOUT
             )
+            reader = messages.FramedReader(reader)
         except Exception as e:
-            logger.tcp_connection_error(peer.ip, peer.port, f"{type(e).__name__}: {e}")
+            logger.tcp_connection_error(peer.address, f"{type(e).__name__}: {e}")
             peer_queue.task_done()
             continue
 
         # Perform handshake
         try:
-            logger.handshake_attempt(peer.ip, peer.port)
+            logger.handshake_attempt(peer.address)
             handshake_req = messages.build_bitTorrent_handshake(torrent_details)
             writer.write(handshake_req)
             await writer.drain()
@@ -68,15 +129,15 @@ async def connection_worker(peer_queue: asyncio.Queue, handshake_queue: asyncio.
             )
 
             if verify.is_handshake(handshake_resp, torrent_details.info_hash):
-                logger.handshake_success(peer.ip, peer.port)
+                logger.handshake_success(peer.address)
             else:
-                logger.handshake_failure(peer.ip, peer.port)
+                logger.handshake_failure(peer.address)
                 writer.close()
                 await writer.wait_closed()
                 peer_queue.task_done()
                 continue
         except Exception as e:
-            logger.handshake_error(peer.ip, peer.port, str(e))
+            logger.handshake_error(peer.address, str(e))
             writer.close()
             await writer.wait_closed()
             peer_queue.task_done()
@@ -90,7 +151,7 @@ async def connection_worker(peer_queue: asyncio.Queue, handshake_queue: asyncio.
 # =======================
 # Wait for Unchoke Helper
 # =======================
-async def wait_for_unchoke(reader: asyncio.StreamReader, peer: Peer, logger: HANDLE_LOGGER) -> bool:
+async def wait_for_unchoke(reader: messages.FramedReader, peer: Peer, logger: HANDLE_LOGGER) -> bool:
     """
     Waits for a choke or unchoke message from the peer.
     Returns True if unchoke is received, False otherwise.
@@ -99,23 +160,34 @@ async def wait_for_unchoke(reader: asyncio.StreamReader, peer: Peer, logger: HAN
         try:
             msg = await asyncio.wait_for(messages.recv_whole_message(reader, isHandshake=False), timeout=TIMEOUT)
         except asyncio.TimeoutError:
-            print(f"Timeout while waiting for choke/unchoke from {peer}.")
+            logger.warn(f"Timeout while waiting for choke/unchoke from {peer.address}.")
             return False
 
         parsed = messages.parse_message(msg)
 
-        if verify.is_unchoke(parsed):
-            logger.unchoke_received(peer.ip, peer.port)
+        # Branch on the message id directly instead of calling a predicate per type
+        msg_id = parsed.id
+        if msg_id == verify.MSG_UNCHOKE and parsed.size == 1:
+            logger.unchoke_received(peer.address)
             return True
-        elif verify.is_choke(parsed):
-            logger.choke_received(peer.ip, peer.port)
+        elif msg_id == verify.MSG_CHOKE and parsed.size == 1:
+            logger.choke_received(peer.address)
         else:
-            logger.irrelevant_message(peer.ip, peer.port)
+            logger.irrelevant_message(peer.address)
 
 
 # =======================
 # Message Handling Worker
 # =======================
+# How to handle the first message a peer sends after the handshake, keyed by
+# message id: (log method, handler returning the pieces to request, whether
+# to wait for an unchoke before downloading)
+FIRST_MESSAGE_HANDLERS = {
+    verify.MSG_HAVE: (HANDLE_LOGGER.have_message_received, handler.have_handler, True),
+    verify.MSG_BITFIELD: (HANDLE_LOGGER.bitfield_message_received, handler.bitfield_handler, False),
+}
+
+
 async def handle_worker(handshake_queue: asyncio.Queue, download_queue: asyncio.Queue, 
                         resume_data: ResumeData, logger: HANDLE_LOGGER):
     """
@@ -134,46 +206,39 @@ async def handle_worker(handshake_queue: asyncio.Queue, download_queue: asyncio.
             msg = await asyncio.wait_for(messages.recv_whole_message(reader, isHandshake=False), timeout=TIMEOUT)
             parsed_message = messages.parse_message(msg)
 
-            # Handle HAVE message
-            if verify.is_have(parsed_message):
-                logger.have_message_received(peer.ip, peer.port)
+            # Look up how to handle the peer's first message by its id
+            first_message = FIRST_MESSAGE_HANDLERS.get(parsed_message.id)
+            if first_message is None:
+                logger.warn(f"Received unexpected message from {peer.address}")
+                handshake_queue.task_done()
+                continue
 
-                pieces_to_request = handler.have_handler(parsed_message, resume_data.verified_pieces)
-                if len(pieces_to_request) == 0:
-                    logger.no_pieces_needed(peer.ip, peer.port)
-                    handshake_queue.task_done()
-                    continue
+            log_received, availability_handler, needs_unchoke = first_message
+            log_received(logger, peer.address)
+
+            pieces_to_request = availability_handler(parsed_message, resume_data.verified_pieces)
+            if not pieces_to_request.any():
+                logger.no_pieces_needed(peer.address)
+                handshake_queue.task_done()
+                continue
 
+            if needs_unchoke:
                 # Wait for unchoke before requesting pieces
-                unchoked = await wait_for_unchoke(reader, peer, logger)
-                if unchoked:
-                    await download_queue.put((peer, reader, writer, pieces_to_request))
-                else:
-                    print(f"Did not receive unchoke from {peer}. Closing connection.")
+                if not await wait_for_unchoke(reader, peer, logger):
+                    logger.warn(f"Did not receive unchoke from {peer.address}. Closing connection.")
                     writer.close()
                     await writer.wait_closed()
-
-            # Handle BITFIELD message
-            elif verify.is_bitfeild(parsed_message):
-                logger.bitfield_message_received(peer.ip, peer.port)
-
-                pieces_to_request = handler.bitfield_handler(parsed_message, resume_data.verified_pieces)
-                if len(pieces_to_request) == 0:
-                    logger.no_pieces_needed(peer.ip, peer.port)
                     handshake_queue.task_done()
                     continue
-
+            else:
                 # Send interested message
-                writer.write(messages.build_interested())
+                writer.write(messages.INTERESTED)
                 await writer.drain()
-                await download_queue.put((peer, reader, writer, pieces_to_request))
 
-            # Unexpected message type
-            else:
-                print(f"Received unexpected message from {peer}")
+            await download_queue.put((peer, reader, writer, pieces_to_request))
 
         except Exception as e:
-            logger.error_handling_message(peer.ip, peer.port, str(e))
+            logger.error_handling_message(peer.address, str(e))
             writer.close()
             await writer.wait_closed()
 
@@ -183,8 +248,8 @@ async def handle_worker(handshake_queue: asyncio.Queue, download_queue: asyncio.
 # =======================
 # Download Worker
 # =======================
-async def download_worker(download_queue: asyncio.Queue, torrent_details: TorrentDetails, 
-                          resume_data: ResumeData, logger: Logger):
+async def download_worker(download_queue: asyncio.Queue, writer_queue: asyncio.Queue,
+                          torrent_details: TorrentDetails, resume_data: ResumeData, logger: Logger):
     """
     Handles downloading pieces from peers by delegating to `download_from_peer`.
     """
@@ -195,10 +260,11 @@ async def download_worker(download_queue: asyncio.Queue, torrent_details: Torren
             break
 
         try:
-            logger.info(f"Started download from {peer.ip}:{peer.port}")
-            await download_from_peer(peer, reader, writer, pieces_to_request, torrent_details, resume_data, logger)
+            logger.info(f"Started download from {peer.address}")
+            await download_from_peer(peer, reader, writer, pieces_to_request, writer_queue,
+                                     torrent_details, resume_data, logger)
         except Exception as e:
-            logger.error(f"Download failed from {peer.ip}:{peer.port} — {e}")
+            logger.error(f"Download failed from {peer.address} — {e}")
 
         download_queue.task_done()
 
@@ -206,111 +272,187 @@ async def download_worker(download_queue: asyncio.Queue, torrent_details: Torren
 # =======================
 # Download Logic
 # =======================
-async def download_from_peer(peer: Peer, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
-                             pieces_available_from_peer: List[int], torrent_details: TorrentDetails,
-                             resume_data: ResumeData, logger: Logger):
+async def download_from_peer(peer: Peer, reader: messages.FramedReader, writer: asyncio.StreamWriter,
+                             pieces_available_from_peer: bitarray, writer_queue: asyncio.Queue,
+                             torrent_details: TorrentDetails, resume_data: ResumeData, logger: Logger):
     """
-    Downloads claimed pieces block by block from a peer, verifies them, and saves them to disk.
+    Downloads claimed pieces block by block from a peer, verifies them, and hands them
+    to the disk writer (see `disk_writer`).
     """
     piece_length = torrent_details.piece_length
+    claimed = []        # Pieces claimed in the current batch
+    handed_off = set()  # Claimed pieces already queued for writing (released by the writer)
+    downloaded = []     # (piece_index, piece_data) received but not yet verified
+    num_of_pieces = torrent_details.num_of_pieces
+    # Where this peer starts scanning its available pieces when claiming
+    scan_start = hash((peer.ip, peer.port)) % num_of_pieces
+
+    async def verify_and_hand_off():
+        """Hashes the downloaded pieces in parallel and queues the good ones for writing."""
+        results = await handler.verify_pieces_batch(
+            [piece_data for _, piece_data in downloaded],
+            [torrent_details.hash_of_pieces[piece_index] for piece_index, _ in downloaded],
+            HASH_EXECUTOR,
+        )
+        for (piece_index, piece_data), hash_ok in zip(downloaded, results):
+            if not hash_ok:
+                logger.warn(f"[{peer.address}] Invalid hash for piece {piece_index}. Discarding...")
+                resume_data.claimed_pieces[piece_index] = False
+                continue
+
+            # Queue the piece for the disk writer (waits only if the writer is falling behind)
+            await writer_queue.put((peer, piece_index, piece_data))
+            handed_off.add(piece_index)
+        downloaded.clear()
 
     try:
-        logger.info(f"[{peer.ip}:{peer.port}] Starting download")
+        logger.info(f"[{peer.address}] Starting download")
 
         while True:
-            logger.info(f"[{peer.ip}:{peer.port}] Claiming a batch to download")
-
+            logger.info(f"[{peer.address}] Claiming a batch to download")
+
+            # The claim loop never awaits, so it cannot interleave with other
+            # workers on the event loop and needs no lock. The same holds for
+            # every other update of the claim and verified bitmaps. Each peer starts its
+            # scan at its own offset (wrapping around), so concurrent peers work
+            # on different regions instead of all competing for the first pieces.
+            # Claimable pieces are found with bitmap operations rather than a
+            # per-piece Python loop.
+            candidates = pieces_available_from_peer & ~resume_data.verified_pieces & ~resume_data.claimed_pieces
             claimed = []
-            # Lock to ensure safe updates to shared data
-            async with resume_data.lock:
-                for piece_index in pieces_available_from_peer:
-                    if len(claimed) >= MAX_CLAIM_PER_PEER:
+            handed_off.clear()
+            for start, stop in ((scan_start, num_of_pieces), (0, scan_start)):
+                while len(claimed) < MAX_CLAIM_PER_PEER:
+                    piece_index = candidates.find(1, start, stop)
+                    if piece_index < 0:
                         break
-                    if not resume_data.verified_pieces[piece_index] and piece_index not in resume_data.claimed_pieces:
-                        resume_data.claimed_pieces.add(piece_index)
-                        claimed.append(piece_index)
+                    resume_data.claimed_pieces[piece_index] = True
+                    claimed.append(piece_index)
+                    start = piece_index + 1
 
             # Exit if no claimable pieces
             if not claimed:
-                logger.warn(f"[{peer.ip}] No more claimable pieces. Closing connection.")
+                logger.warn(f"[{peer.address}] No more claimable pieces. Closing connection.")
                 break
 
-            logger.info(f"[{peer.ip}:{peer.port}] Batch Claimed → {claimed}")
+            logger.info(f"[{peer.address}] Batch Claimed → {claimed}")
 
             # Download each claimed piece
             for piece_index in claimed:
-                num_blocks = (piece_length + BLOCK_SIZE - 1) // BLOCK_SIZE
-                piece_data = bytearray(piece_length)
-
-                for block_num in range(num_blocks):
-                    begin = block_num * BLOCK_SIZE
-                    block_length = min(BLOCK_SIZE, piece_length - begin)
-
-                    # Send request for the block
-                    request_msg = messages.build_request(piece_index, begin, block_length)
-                    writer.write(request_msg)
-                    await writer.drain()
-
-                    # Wait for the corresponding PIECE message
-                    while True:
-                        try:
-                            msg = await messages.recv_whole_message(reader, isHandshake=False)
-                            parsed = messages.parse_message(msg)
-
-                            if verify.is_piece(parsed):
-                                r_index, r_begin = struct.unpack(">II", parsed.payload[:8])
-                                r_block = parsed.payload[8:]
-
-                                if r_index == piece_index and r_begin == begin:
-                                    piece_data[begin:begin + len(r_block)] = r_block
-                                    break
-                        except Exception as e:
-                            logger.error(f"[{peer.ip}] Error during block read: {e}")
-                            raise e
-
-                # Verify the piece hash
-                if not handler.verify_piece_hash(piece_data, torrent_details.hash_of_pieces[piece_index]):
-                    logger.warn(f"[{peer.ip}] Invalid hash for piece {piece_index}. Discarding...")
-                    async with resume_data.lock:
-                        resume_data.claimed_pieces.discard(piece_index)
-                    continue
-
-                # Save piece and mark as downloaded
-                save_piece_to_disk(piece_index, piece_data, torrent_details)
-                logger.success(f"[{peer.ip}] Piece {piece_index} downloaded and verified ✅")
-
-                async with resume_data.lock:
-                    resume_data.verified_pieces[piece_index] = True
-                    resume_data.downloaded += 1
-                    resume_data.claimed_pieces.discard(piece_index)
-
-                logger.update_stats(resume_data.downloaded, torrent_details.num_of_pieces, peer.ip)
+                # The last piece may be shorter than the nominal piece length
+                piece_size = min(piece_length, torrent_details.total_length - piece_index * piece_length)
+                piece_data = bytearray(piece_size)
+
+                next_begin = 0      # Offset of the next block to request
+                pending = set()     # Offsets of blocks requested but not yet received
+
+                while next_begin < piece_size or pending:
+                    # Top up the pipeline so up to MAX_PIPELINE requests are in flight,
+                    # sending all new requests with a single write
+                    requests = []
+                    while next_begin < piece_size and len(pending) < MAX_PIPELINE:
+                        block_length = min(BLOCK_SIZE, piece_size - next_begin)
+                        requests.append(messages.build_request(piece_index, next_begin, block_length))
+                        pending.add(next_begin)
+                        next_begin += block_length
+
+                    if requests:
+                        writer.write(b''.join(requests))
+                        await writer.drain()
+
+                    # Wait for the next PIECE message and store its block.
+                    # This runs once per block, so the frame is inspected in place
+                    # (id byte + header via unpack_from) instead of going through
+                    # parse_message, and the block is copied straight from the frame.
+                    try:
+                        msg = await messages.recv_whole_message(reader, isHandshake=False)
+
+                        # PIECE: <len><id=7><index><begin><block>, with a non-empty block
+                        if len(msg) > 13 and msg[4] == verify.MSG_PIECE:
+                            r_index, r_begin = PIECE_HEADER.unpack_from(msg, 5)
+
+                            if r_index == piece_index and r_begin in pending:
+                                piece_data[r_begin:r_begin + len(msg) - 13] = memoryview(msg)[13:]
+                                pending.discard(r_begin)
+                    except Exception as e:
+                        logger.error(f"[{peer.address}] Error during block read: {e}")
+                        raise e
+
+                # Verify pieces in batches so several are hashed in parallel
+                downloaded.append((piece_index, piece_data))
+                if len(downloaded) >= VERIFY_BATCH_SIZE:
+                    await verify_and_hand_off()
+
+            # Verify whatever is left of this claim batch
+            if downloaded:
+                await verify_and_hand_off()
 
     except Exception as e:
-        logger.error(f"[{peer.ip}] Peer download error: {e}")
-        async with resume_data.lock:
-            for piece_index in claimed:
-                resume_data.claimed_pieces.discard(piece_index)
+        logger.error(f"[{peer.address}] Peer download error: {e}")
+        for piece_index in claimed:
+            if piece_index not in handed_off:
+                resume_data.claimed_pieces[piece_index] = False
 
     finally:
         writer.close()
         await writer.wait_closed()
 
 
+# =======================
+# Disk Writer
+# =======================
+async def disk_writer(writer_queue: asyncio.Queue, torrent_details: TorrentDetails,
+                      resume_data: ResumeData, logger: Logger):
+    """
+    Writes verified pieces to disk on the disk thread, so download workers never wait on I/O.
+
+    All pieces waiting in the queue are taken as one batch, letting runs of
+    consecutive pieces be written with a single pwritev per file. Pieces are
+    marked as verified only after they are on disk.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await writer_queue.get()]
+        while not writer_queue.empty():
+            batch.append(writer_queue.get_nowait())
+
+        pieces = [(piece_index, piece_data) for _, piece_index, piece_data in batch]
+        try:
+            await loop.run_in_executor(DISK_EXECUTOR, save_pieces_to_disk, pieces, torrent_details)
+        except Exception as e:
+            logger.error(f"Failed to write pieces to disk: {e}")
+            # Release the pieces so they are downloaded again
+            for _, piece_index, _ in batch:
+                resume_data.claimed_pieces[piece_index] = False
+        else:
+            for peer, piece_index, _ in batch:
+                if resume_data.mark_verified(piece_index):
+                    resume_data.downloaded += 1
+                resume_data.claimed_pieces[piece_index] = False
+                logger.success(f"[{peer.address}] Piece {piece_index} downloaded and verified ✅")
+                # Active peers are counted per IP: one host on several ports is one peer
+                logger.update_stats(resume_data.verified_count, torrent_details.num_of_pieces, peer.ip)
+
+        for _ in batch:
+            writer_queue.task_done()
+
+
 # =======================
 # Save Piece to Disk
 # =======================
-def save_piece_to_disk(piece_index: int, piece_data: bytes, torrent_details: TorrentDetails):
+def _piece_segments(piece_index: int, piece_data: bytes, torrent_details: TorrentDetails):
     """
-    Writes the downloaded piece to its corresponding location in the files described by the torrent.
-    Handles multi-file torrents by writing overlapping segments of the piece to correct files.
+    Splits a piece into the parts that belong to each file of the torrent.
+
+    Yields:
+        Tuple[int, int, memoryview]: File descriptor, offset within the file, and data (no copy).
     """
     global_offset = piece_index * torrent_details.piece_length
     piece_size = len(piece_data)
     piece_end = global_offset + piece_size
+    piece_view = memoryview(piece_data)
 
     for file_entry in torrent_details.files:
-        file_path = file_entry['path']
         file_offset = file_entry['offset']
         file_length = file_entry['length']
         file_end = file_offset + file_length
@@ -320,50 +462,123 @@ def save_piece_to_disk(piece_index: int, piece_data: bytes, torrent_details: Tor
         overlap_end = min(piece_end, file_end)
 
         if overlap_start < overlap_end:
-            # Extract relevant segment from piece
-            piece_data_start = overlap_start - global_offset
-            piece_data_end = overlap_end - global_offset
-            data_to_write = piece_data[piece_data_start:piece_data_end]
+            # Extract relevant segment from piece, and the offset within the file to write it
+            yield (file_entry['fd'], overlap_start - file_offset,
+                   piece_view[overlap_start - global_offset:overlap_end - global_offset])
+
+
+def _write_segments(fd: int, segments: list, offset: int):
+    """
+    Writes contiguous segments at `offset` with os.pwritev, finishing a short
+    write (disk full, or a run larger than the kernel's per-call limit) with
+    os.pwrite at the advanced offset.
 
-            # Offset within the file to write
-            file_write_offset = overlap_start - file_offset
+    Raises:
+        OSError: If the data cannot be written completely.
+    """
+    written = os.pwritev(fd, segments, offset)
+    if written == sum(len(segment) for segment in segments):
+        return
+
+    for segment in segments:
+        # Skip the part of this segment that is already on disk
+        if written >= len(segment):
+            written -= len(segment)
+            offset += len(segment)
+            continue
+        segment = segment[written:]
+        offset += written
+        written = 0
 
-            # Ensure directories exist
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        while segment:
+            count = os.pwrite(fd, segment, offset)
+            if count == 0:
+                raise OSError(f"Short write at offset {offset}: no progress writing {len(segment)} bytes")
+            segment = segment[count:]
+            offset += count
 
-            # Create the file if it doesn't exist, with the correct size
-            if not os.path.exists(file_path):
-                with open(file_path, 'wb') as f:
-                    f.truncate(file_length)
 
-            # Write the data segment
-            with open(file_path, 'r+b') as f:
-                f.seek(file_write_offset)
-                f.write(data_to_write)
+def save_pieces_to_disk(pieces: list, torrent_details: TorrentDetails):
+    """
+    Writes several pieces to disk, coalescing consecutive pieces.
+
+    For each run of consecutive piece indices, the segments going to the same
+    file are contiguous in that file, so they are written with one os.pwritev
+    (see `_write_segments`, which completes short writes).
+
+    Raises:
+        OSError: If a run cannot be written completely.
+
+    Args:
+        pieces (list): (piece_index, piece_data) tuples.
+        torrent_details (TorrentDetails): Torrent metadata with open files.
+    """
+    writes = {}          # fd -> (file offset, [segments]) for the current run
+    previous_index = None
+
+    for piece_index, piece_data in sorted(pieces, key=lambda piece: piece[0]):
+        # A gap in piece indices ends the run: flush what has been gathered
+        if previous_index is not None and piece_index != previous_index + 1:
+            for fd, (file_write_offset, segments) in writes.items():
+                _write_segments(fd, segments, file_write_offset)
+            writes = {}
+        previous_index = piece_index
+
+        for fd, file_write_offset, segment in _piece_segments(piece_index, piece_data, torrent_details):
+            if fd in writes:
+                writes[fd][1].append(segment)
+            else:
+                writes[fd] = (file_write_offset, [segment])
+
+    for fd, (file_write_offset, segments) in writes.items():
+        _write_segments(fd, segments, file_write_offset)
 
 
 # =======================
 # Main Orchestration
 # =======================
-async def main(peers: list, details: TorrentDetails, resume_data: ResumeData, logger: Logger):
+def enqueue_peer(peer_queue: asyncio.Queue, queued_peers: set, peer: tuple):
     """
-    Orchestrates the entire download pipeline:
-    1. Creates queues for connection, handshake, and download stages.
-    2. Spawns worker tasks for each stage.
-    3. Waits for all queues to drain.
-    4. Cancels any remaining tasks.
+    Adds a peer from the tracker to the connection queue.
+
+    Called by the tracker task on the event loop for each peer received.
+    Trackers return mostly the same peers on every announce, and several
+    trackers often share peers, so a peer already waiting in the queue is
+    skipped. When the queue is full the peer is dropped: the tracker is asked
+    again every interval, so this only applies back-pressure on a flood of peers.
+
+    Args:
+        peer_queue (asyncio.Queue): Bounded queue read by the connection workers.
+        queued_peers (set): (ip, port) of every peer waiting in `peer_queue`;
+            connection workers remove a peer when they take it.
+        peer (tuple): (ip, port) of the peer.
     """
-    peer_queue = asyncio.Queue()
-    handshake_queue = asyncio.Queue()
-    download_queue = asyncio.Queue()
+    if peer in queued_peers:
+        return
+    try:
+        peer_queue.put_nowait(Peer(peer[0], peer[1]))
+    except asyncio.QueueFull:
+        return
+    queued_peers.add(peer)
 
-    # Populate peer queue
-    for peer in peers:
-        await peer_queue.put(Peer(peer[0], peer[1]))
+
+async def main(peer_queue: asyncio.Queue, queued_peers: set, details: TorrentDetails,
+               resume_data: ResumeData, logger: Logger):
+    """
+    Runs the download pipeline for the lifetime of the client:
+    1. Creates queues for the handshake, download, and disk-write stages.
+    2. Spawns long-lived worker tasks for each stage.
+    3. Connection workers pick up peers as soon as the tracker task adds them to `peer_queue`.
+    4. On shutdown (or if a worker fails), cancels every worker and waits for it to exit.
+    """
+    # Bounded, so upstream workers wait instead of piling up idle open connections
+    handshake_queue = asyncio.Queue(maxsize=HANDSHAKE_QUEUE_SIZE)
+    download_queue = asyncio.Queue(maxsize=DOWNLOAD_QUEUE_SIZE)
+    writer_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
 
     # Start connection tasks
     tcp_bit_logger = CONNECTION_LOGGER()
-    conn_tasks = [asyncio.create_task(connection_worker(peer_queue, handshake_queue, details, tcp_bit_logger))
+    conn_tasks = [asyncio.create_task(connection_worker(peer_queue, queued_peers, handshake_queue, details, tcp_bit_logger))
                   for _ in range(NUM_CONN_TASKS)]
 
     # Start handling tasks
@@ -372,16 +587,18 @@ async def main(peers: list, details: TorrentDetails, resume_data: ResumeData, lo
                     for _ in range(NUM_HANDLE_TASKS)]
 
     # Start download tasks
-    download_tasks = [asyncio.create_task(download_worker(download_queue, details, resume_data, logger))
+    download_tasks = [asyncio.create_task(download_worker(download_queue, writer_queue, details, resume_data, logger))
                       for _ in range(NUM_DOWNLOAD_TASKS)]
 
-    # Wait for all stages to complete
-    await peer_queue.join()
-    await handshake_queue.join()
-    await download_queue.join()
-
-    # Cancel any pending tasks
-    for task in conn_tasks + handle_tasks + download_tasks:
-        task.cancel()
+    # Start the disk writer task
+    writer_task = asyncio.create_task(disk_writer(writer_queue, details, resume_data, logger))
 
-    print("All tasks completed.")
+    # Workers run until the client shuts down; then cancel them all and wait for
+    # them to finish, so their connections are closed before the loop goes away
+    all_tasks = [*conn_tasks, *handle_tasks, *download_tasks, writer_task]
+    try:
+        await asyncio.gather(*all_tasks)
+    finally:
+        for task in all_tasks:
+            task.cancel()
+        await asyncio.gather(*all_tasks, return_exceptions=True)
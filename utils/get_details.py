@@ -1,9 +1,16 @@
-import sys
 from math import ceil
+from itertools import accumulate
 from typing import List
-import bencodepy
 import hashlib
 
+# -------------------------------
+# Custom Exceptions
+# -------------------------------
+class TorrentParseError(Exception):
+    """Raised when the torrent metadata is missing a field or has an invalid value"""
+    pass
+
+
 # -------------------------------
 # Function: get_piece_length
 # -------------------------------
@@ -17,12 +24,14 @@ def get_piece_length(info_dict: dict) -> int:
 
     Returns:
         int: Piece length in bytes.
+
+    Raises:
+        TorrentParseError: If the piece length is missing.
     """
     try:
         length = info_dict[b'piece length']
     except Exception as E:
-        print(f"Error: {E}")
-        sys.exit(1)
+        raise TorrentParseError(f"Missing piece length: {E}") from E
 
     return length
 
@@ -40,6 +49,9 @@ def get_total_length(info_dict: dict) -> int:
 
     Returns:
         int: Total size of all files in bytes.
+
+    Raises:
+        TorrentParseError: If a file length is missing.
     """
     total_length = 0
     try:
@@ -52,8 +64,7 @@ def get_total_length(info_dict: dict) -> int:
             total_length += info_dict[b'length']
 
     except Exception as E:
-        print(f"Error: {E}")
-        sys.exit(1)
+        raise TorrentParseError(f"Invalid file lengths: {E}") from E
 
     return total_length
 
@@ -89,6 +100,9 @@ def get_file_sizes(info_dict: dict) -> list:
 
     Returns:
         list: Sizes of all files in bytes.
+
+    Raises:
+        TorrentParseError: If a file length is missing.
     """
     file_sizes = []
     try:
@@ -101,8 +115,7 @@ def get_file_sizes(info_dict: dict) -> list:
             file_sizes.append(info_dict[b'length'])
 
     except Exception as E:
-        print(f"Error: {E}")
-        sys.exit(1)
+        raise TorrentParseError(f"Invalid file lengths: {E}") from E
 
     return file_sizes
 
@@ -122,35 +135,31 @@ def get_hash_list(info_dict: dict, num_of_pieces: int) -> List[bytes]:
     Returns:
         List[bytes]: List of SHA1 hashes for each piece.
     """
-    hashes = []
     pieces = info_dict[b'pieces']
 
-    for i in range(num_of_pieces):
-        # Each SHA1 hash is 20 bytes long
-        hashes.append(pieces[20 * i:20 * (i + 1)])
-
-    return hashes
+    # Each SHA1 hash is 20 bytes long
+    return [pieces[i:i + 20] for i in range(0, 20 * num_of_pieces, 20)]
 
 
 # -------------------------------
 # Function: get_info_hash
 # -------------------------------
 # Generates the unique info hash (SHA1) used for peer and tracker communication.
-def get_info_hash(info_dict: dict) -> bytes:
+def get_info_hash(info_bencoded: bytes) -> bytes:
     """
     Generate the SHA1 hash of the 'info' dictionary (info_hash).
 
+    The hash must be taken over the exact bytes of the info dictionary in
+    the .torrent file, so the raw slice is hashed instead of re-encoding
+    the decoded dictionary.
+
     Args:
-        info_dict (dict): The "info" section of the torrent metadata.
+        info_bencoded (bytes): Raw bencoded "info" section of the torrent file.
 
     Returns:
         bytes: SHA1 hash digest of the info dictionary.
     """
-    # Bencode the info dict to generate consistent bytes for hashing
-    info_bencoded = bencodepy.encode(info_dict)
-    info_hash = hashlib.sha1(info_bencoded).digest()
-
-    return info_hash
+    return hashlib.sha1(info_bencoded).digest()
 
 
 # -------------------------------
@@ -171,36 +180,28 @@ def get_file_details(info_dict: dict, root: str):
             - length: Size of the file in bytes.
             - offset: Offset position for the file in the concatenated data.
     """
-    files_list = []
-
     # Multi-file torrent
     if b'files' in info_dict:
-        offset = 0
-        for file_info in info_dict[b'files']:
-            # Convert byte strings to human-readable strings
-            file_path_str = [s.decode('utf-8') for s in file_info[b'path']]
-            file_path = '/'.join(file_path_str)
-            file_length = file_info[b'length']
-
-            files_list.append({
-                'path': root + file_path,
-                'length': file_length,
+        files = info_dict[b'files']
+        # Offset of each file in the concatenated data is the running total of the lengths before it
+        offsets = accumulate((file_info[b'length'] for file_info in files), initial=0)
+
+        # Path segments are joined as bytes and decoded once per file
+        return [
+            {
+                'path': root + b'/'.join(file_info[b'path']).decode('utf-8'),
+                'length': file_info[b'length'],
                 'offset': offset,
-            })
-
-            # Update offset for the next file
-            offset += file_length
+            }
+            for file_info, offset in zip(files, offsets)
+        ]
 
     # Single-file torrent
-    else:
-        file_length = info_dict.get(b'length', 0)
-        files_list.append({
-            'path': root + info_dict.get(b'name', b'').decode('utf-8'),
-            'length': file_length,
-            'offset': 0,
-        })
-
-    return files_list
+    return [{
+        'path': root + info_dict.get(b'name', b'').decode('utf-8'),
+        'length': info_dict.get(b'length', 0),
+        'offset': 0,
+    }]
 
 
 # -------------------------------
@@ -208,6 +209,7 @@ def get_file_details(info_dict: dict, root: str):
 # -------------------------------
 # Specifies the functions to be exported when this module is imported.
 __all__ = [
+    "TorrentParseError",
     "get_piece_length",
     "get_total_length",
     "get_total_pieces",
@@ -1,11 +1,13 @@
 import struct
 import socket
+import asyncio
 import random
-import sys
 from urllib.parse import urlparse
-from typing import List, Tuple
-import queue
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from .logger import Logger, CONNECTION_LOGGER, HANDLE_LOGGER, TRACKER_LOGGER
+from .details import PEER_ID
+from .get_details import get_total_length, TorrentParseError
 
 # ------------------------------
 # Constants
@@ -14,36 +16,128 @@ PORT_NUMBER = 6881          # Default port number used for BitTorrent peer commu
 MAX_TRY = 1                 # Maximum retry attempts for requests (connection/announce)
 MAX_TIME_TO_WAIT = 1        # Timeout for tracker communication in seconds
 
+DEFAULT_INTERVAL = 60       # Re-announce interval in seconds when no tracker replied
+
+TRACKER_RESPONSE_HEADER = struct.Struct(">LL")  # Action and transaction ID at the start of every tracker response
+PEER_ENTRY = struct.Struct(">4sH")  # Compact peer entry in an announce response: IPv4 address and port
+
+# ------------------------------
+# Data Classes
+# ------------------------------
+@dataclass
+class SwarmInfo:
+    """Swarm statistics reported by a tracker in its announce response"""
+    interval: int       # Seconds to wait before announcing again
+    seeders: int        # Number of peers with the complete torrent
+    leechers: int       # Number of peers still downloading
+
 # ------------------------------
 # Custom Exceptions
 # ------------------------------
-class InvalidConnectionRespone(Exception):
+class TrackerError(Exception):
+    """Raised when a tracker cannot be reached or returns an unusable response"""
+    pass
+
+class InvalidConnectionRespone(TrackerError):
     """Raised when tracker returns an invalid response during connection request"""
     pass
 
-class InvalidAnnounceRespone(Exception):
+class InvalidAnnounceRespone(TrackerError):
     """Raised when tracker returns an invalid response during announce request"""
     pass
 
+# ------------------------------
+# Class: _TrackerProtocol
+# ------------------------------
+class _TrackerProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol for a UDP socket shared by every tracker request in an
+    announce round. Replies are matched to the waiting request by the
+    transaction ID that every tracker response starts with (after the action).
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}   # transaction_id -> Future resolved with the tracker's reply
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < 8:
+            return
+        action, transaction_id = TRACKER_RESPONSE_HEADER.unpack_from(data)
+        response = self.pending.pop(transaction_id, None)
+        if response is not None and not response.done():
+            response.set_result(data)
+
+    def connection_lost(self, exc: Optional[Exception]):
+        for response in self.pending.values():
+            if not response.done():
+                response.set_exception(exc or ConnectionError("Tracker socket closed"))
+        self.pending.clear()
+
+# ------------------------------
+# Function: _send_and_receive
+# ------------------------------
+async def _send_and_receive(tracker: _TrackerProtocol, request: bytes, transaction_id: int,
+                            tracker_ip: str, tracker_port: int, logger: TRACKER_LOGGER) -> bytes:
+    """
+    Sends a UDP request to a tracker over the shared socket and waits for
+    the reply carrying the same transaction ID, retrying up to MAX_TRY
+    times on timeout.
+
+    Args:
+        tracker (_TrackerProtocol): Shared tracker socket of this announce round.
+        request (bytes): Packed tracker request.
+        transaction_id (int): Transaction ID packed into the request.
+        tracker_ip (str): IP address of the tracker.
+        tracker_port (int): Port of the tracker.
+        logger (TRACKER_LOGGER): Logger for timeout events.
+
+    Returns:
+        bytes: The tracker's reply.
+
+    Raises:
+        socket.gaierror: If the tracker's hostname cannot be resolved.
+        TimeoutError: If no reply arrives within MAX_TRY attempts.
+    """
+    loop = asyncio.get_running_loop()
+    addr_info = await loop.getaddrinfo(tracker_ip, tracker_port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    tracker_addr = addr_info[0][4]
+
+    response = loop.create_future()
+    tracker.pending[transaction_id] = response
+    try:
+        for _ in range(MAX_TRY):
+            tracker.transport.sendto(request, tracker_addr)
+            try:
+                # shield keeps the future alive across attempts, so a late reply is still used
+                return await asyncio.wait_for(asyncio.shield(response), timeout=MAX_TIME_TO_WAIT)
+            except asyncio.TimeoutError:
+                logger.tracker_timeout(tracker_ip, tracker_port)
+    finally:
+        tracker.pending.pop(transaction_id, None)
+
+    raise TimeoutError("Timeout Reached!")
+
 # ------------------------------
 # Function: _make_connection_request
 # ------------------------------
-def _make_connection_request(tracker_ip: str, tracker_port: int, count: int, logger: TRACKER_LOGGER) -> int:
+async def _make_connection_request(tracker: _TrackerProtocol, tracker_ip: str, tracker_port: int,
+                                   logger: TRACKER_LOGGER) -> int:
     """
     Sends a connection request to a tracker to obtain a valid connection_id.
     
     Args:
+        tracker (_TrackerProtocol): Shared tracker socket of this announce round.
         tracker_ip (str): IP address of the tracker.
         tracker_port (int): Port of the tracker.
-        count (int): Retry counter for failed attempts.
         logger (TRACKER_LOGGER): Logger for connection events.
 
     Returns:
         int: The connection_id from the tracker to be used in announce request.
     """
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(MAX_TIME_TO_WAIT)
-
     protocol_id = 0x41727101980  # Predefined protocol ID for BitTorrent UDP tracker protocol
     action = 0                   # Action = 0 (connect request)
     transaction_id = random.randint(0, 2**32 - 1)  # Unique ID to match requests and responses
@@ -51,32 +145,9 @@ def _make_connection_request(tracker_ip: str, tracker_port: int, count: int, log
     # Pack data into binary format according to UDP tracker protocol spec
     connection_req = struct.pack(">QLL", protocol_id, action, transaction_id)
 
-    # Send connection request to tracker
-    try:
-        logger.connection_request_sent(tracker_ip, tracker_port)
-        sock.sendto(connection_req, (tracker_ip, tracker_port))
-    except socket.timeout:
-        logger.tracker_timeout(tracker_ip, tracker_port)
-        if count == MAX_TRY:
-            raise TimeoutError("Timeout Reached!")
-        return _make_connection_request(tracker_ip, tracker_port, count + 1, logger)
-    except socket.gaierror:
-        raise socket.gaierror
-    except Exception as e:
-        print(f"Error: {e}")
-        sys.exit(1)
-
-    # Receive response from tracker
-    try:
-        connection_resp, addr = sock.recvfrom(2048)
-    except socket.timeout:
-        logger.tracker_timeout(tracker_ip, tracker_port)
-        if count == MAX_TRY:
-            raise TimeoutError("Timeout Reached!")
-        return _make_connection_request(tracker_ip, tracker_port, count + 1, logger)
-    except Exception as e:
-        print(f"Error: {e}")
-        sys.exit(1)
+    # Send connection request to tracker and wait for its response
+    logger.connection_request_sent(tracker_ip, tracker_port)
+    connection_resp = await _send_and_receive(tracker, connection_req, transaction_id, tracker_ip, tracker_port, logger)
 
     # Validate response length (must be at least 16 bytes)
     if len(connection_resp) < 16:
@@ -99,37 +170,47 @@ def _make_connection_request(tracker_ip: str, tracker_port: int, count: int, log
 # ------------------------------
 # Function: get_interval_data
 # ------------------------------
-def get_interval_data() -> List[int]:
+def get_interval_data(swarm_by_tracker: Dict[str, SwarmInfo]) -> SwarmInfo:
     """
-    Returns tracker interval and current swarm info.
+    Combines the swarm info reported by each tracker: the shortest
+    re-announce interval and the largest seeder/leecher counts.
+
+    Args:
+        swarm_by_tracker (Dict[str, SwarmInfo]): Swarm info keyed by tracker URL.
 
     Returns:
-        List[int]: [interval_seconds, num_seeders, num_leechers]
+        SwarmInfo: Combined swarm info (DEFAULT_INTERVAL and no peers if no tracker replied).
     """
-    return [Interval, Seeder, Leecher]
+    if not swarm_by_tracker:
+        return SwarmInfo(DEFAULT_INTERVAL, 0, 0)
+
+    infos = swarm_by_tracker.values()
+    return SwarmInfo(interval=min(info.interval for info in infos),
+                     seeders=max(info.seeders for info in infos),
+                     leechers=max(info.leechers for info in infos))
 
 # ------------------------------
 # Function: _make_announce_request
 # ------------------------------
-def _make_announce_request(connection_id: int, info_hash: bytes, total_length: int,
-                           tracker_ip: str, tracker_port: int, count: int, logger: TRACKER_LOGGER) -> List[Tuple[str, int]]:
+async def _make_announce_request(tracker: _TrackerProtocol, connection_id: int, info_hash: bytes, total_length: int,
+                           tracker_ip: str, tracker_port: int, logger: TRACKER_LOGGER) -> Tuple[List[Tuple[str, int]], SwarmInfo]:
     """
     Sends an announce request to the tracker to retrieve peer information.
 
     Args:
+        tracker (_TrackerProtocol): Shared tracker socket of this announce round.
         connection_id (int): Connection ID obtained from connection request.
         info_hash (bytes): SHA1 hash of torrent's info dictionary.
         total_length (int): Total size of files in torrent.
         tracker_ip (str): Tracker IP address.
         tracker_port (int): Tracker port number.
-        count (int): Retry attempt counter.
         logger (TRACKER_LOGGER): Logger for announce events.
 
     Returns:
-        List[Tuple[str, int]]: List of peers as (IP, port) tuples.
+        Tuple[List[Tuple[str, int]], SwarmInfo]: Peers as (IP, port) tuples, and the tracker's swarm info.
     """
     transaction_id = random.randint(0, 2**32 - 1)
-    peer_id = b'-TR4003-' + bytes(random.getrandbits(8) for _ in range(12))  # Random peer ID
+    peer_id = PEER_ID  # Session peer ID, same one used in peer handshakes
     port = PORT_NUMBER
     action = 1  # Action = 1 (announce)
     
@@ -146,39 +227,11 @@ def _make_announce_request(connection_id: int, info_hash: bytes, total_length: i
                                connection_id, action, transaction_id, info_hash, peer_id,
                                downloaded, left, uploaded, event, ip, key, num_want, port)
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(MAX_TIME_TO_WAIT)
-
+    # Send announce request and wait for its response
     logger.announce_request_sent(tracker_ip, tracker_port)
-
-    # Send announce request
-    try:
-        sock.sendto(announce_req, (tracker_ip, tracker_port))
-    except socket.timeout:
-        logger.tracker_timeout(tracker_ip, tracker_port)
-        if count == MAX_TRY:
-            raise TimeoutError("Timeout Reached!")
-        return _make_announce_request(connection_id, info_hash, total_length, tracker_ip, tracker_port, count + 1, logger)
-    except socket.gaierror:
-        raise socket.gaierror
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        sys.exit(1)
-
+    announce_resp = await _send_and_receive(tracker, announce_req, transaction_id, tracker_ip, tracker_port, logger)
     logger.announce_response_received(tracker_ip, tracker_port)
 
-    # Receive announce response
-    try:
-        announce_resp, addr = sock.recvfrom(4096)
-    except socket.timeout:
-        logger.tracker_timeout(tracker_ip, tracker_port)
-        if count == MAX_TRY:
-            raise TimeoutError("Timeout Reached!")
-        return _make_announce_request(connection_id, info_hash, total_length, tracker_ip, tracker_port, count + 1, logger)
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        sys.exit(1)
-
     # Validate response length
     if len(announce_resp) < 20:
         logger.invalid_announce_response(tracker_ip, tracker_port)
@@ -187,12 +240,6 @@ def _make_announce_request(connection_id: int, info_hash: bytes, total_length: i
     # Unpack first 20 bytes for swarm info
     action_resp, transaction_id_resp, interval, leechers, seeders = struct.unpack(">LLLLL", announce_resp[0:20])
 
-    # Update global swarm data for stats
-    global Interval, Seeder, Leecher
-    Interval = interval
-    Seeder = seeders
-    Leecher = leechers
-
     # Validate response
     if action != action_resp:
         logger.invalid_announce_response(tracker_ip, tracker_port)
@@ -201,35 +248,91 @@ def _make_announce_request(connection_id: int, info_hash: bytes, total_length: i
         logger.invalid_announce_response(tracker_ip, tracker_port)
         raise InvalidAnnounceRespone("Invalid announce response: transaction ID mismatch!")
 
-    # Parse peers (6 bytes per peer: 4 bytes IP, 2 bytes port)
-    peers = []
-    offset = 20
-    while offset < len(announce_resp):
-        ip_packed = announce_resp[offset:offset + 4]
-        port_packed = announce_resp[offset + 4:offset + 6]
+    # Parse peers (6 bytes per peer: 4 bytes IP, 2 bytes port); a trailing partial entry is ignored
+    peer_data = memoryview(announce_resp)[20:]
+    peer_data = peer_data[:len(peer_data) - len(peer_data) % PEER_ENTRY.size]
+    peers = [(socket.inet_ntoa(ip), port) for ip, port in PEER_ENTRY.iter_unpack(peer_data)]
 
-        ip = socket.inet_ntoa(ip_packed)
-        port = struct.unpack(">H", port_packed)[0]
+    logger.peers_received(tracker_ip, tracker_port, len(peers))
+    return peers, SwarmInfo(interval, seeders, leechers)
 
-        peers.append((ip, port))
-        offset += 6
 
-    logger.peers_received(tracker_ip, tracker_port, len(peers))
-    return peers
+# ------------------------------
+# Function: _announce_to_tracker
+# ------------------------------
+async def _announce_to_tracker(tracker: _TrackerProtocol, url: str, info_hash: bytes, total_length: int,
+                               push_peer: Callable[[Tuple[str, int]], None]) -> Optional[SwarmInfo]:
+    """
+    Connects and announces to a single tracker, passing every peer
+    it returns to `push_peer`. Failures only skip this tracker.
+
+    Args:
+        tracker (_TrackerProtocol): Shared tracker socket of this announce round.
+        url (str): UDP tracker URL.
+        info_hash (bytes): SHA1 hash of torrent info dictionary.
+        total_length (int): Total size of files in torrent.
+        push_peer (Callable): Called with each (IP, port) peer received.
+
+    Returns:
+        Optional[SwarmInfo]: The tracker's swarm info, or None if it failed.
+    """
+    parsed_url = urlparse(url)
+    tracker_ip = parsed_url.hostname
+    tracker_port = parsed_url.port
+    tracker_logger = TRACKER_LOGGER()
+
+    # Step 1: Establish connection with tracker
+    try:
+        connection_id = await _make_connection_request(tracker, tracker_ip, tracker_port, tracker_logger)
+    except socket.gaierror:
+        tracker_logger.warn(f"DNS lookup failed for {tracker_ip}, trying next tracker!")
+        return None
+    except TimeoutError:
+        tracker_logger.warn(f"Tracker {tracker_ip}:{tracker_port} timed out, trying next tracker!")
+        return None
+    except TrackerError as inv:
+        tracker_logger.warn(f"{inv} Trying next tracker!")
+        return None
+    except Exception as e:
+        tracker_logger.error(f"Error: {type(e).__name__} {e}. Trying next tracker!")
+        return None
+
+    # Step 2: Announce to tracker and get peer list
+    try:
+        peers, swarm_info = await _make_announce_request(tracker, connection_id, info_hash, total_length, tracker_ip, tracker_port, tracker_logger)
+    except TimeoutError:
+        return None
+    except TrackerError as inv:
+        tracker_logger.warn(str(inv))
+        return None
+    except Exception as e:
+        tracker_logger.error(f"Error: {type(e).__name__} {e}")
+        return None
+
+    for peer in peers:
+        push_peer(peer)
+    return swarm_info
 
 # ------------------------------
 # Function: get_peers_list
 # ------------------------------
-def get_peers_list(torrent_info: dict, info_hash: bytes, peer_list: queue.Queue, logger: Logger) -> None:
+async def get_peers_list(torrent_info: dict, info_hash: bytes, push_peer: Callable[[Tuple[str, int]], None],
+                         logger: Logger) -> Dict[str, SwarmInfo]:
     """
-    Extracts tracker URLs from torrent file, contacts trackers,
-    and populates the peer list queue with active peers.
+    Extracts tracker URLs from torrent file, contacts all trackers concurrently,
+    and passes every peer received to `push_peer`.
 
     Args:
         torrent_info (dict): Decoded torrent metadata.
         info_hash (bytes): SHA1 hash of torrent info dictionary.
-        peer_list (queue.Queue): Shared queue for peer data.
+        push_peer (Callable): Called with each (IP, port) peer as soon as a tracker returns it.
         logger (Logger): Logger for logging events.
+
+    Returns:
+        Dict[str, SwarmInfo]: Swarm info of every tracker that replied, keyed by URL.
+
+    Raises:
+        TorrentParseError: If the torrent has no valid tracker list.
     """
     tracker_url_list = []
 
@@ -245,57 +348,24 @@ def get_peers_list(torrent_info: dict, info_hash: bytes, peer_list: queue.Queue,
                 tracker_url_list.append(url[0].decode('utf-8'))
 
     except Exception as E:
-        print(f"Error : {E}")
-        sys.exit(1)
+        raise TorrentParseError(f"Invalid tracker list: {E}") from E
 
     # Calculate total size of files for this torrent
+    total_length = get_total_length(torrent_info[b'info'])
+
+    # Announce to every tracker at once over one shared UDP socket;
+    # each one pushes its peers as soon as it replies
+    loop = asyncio.get_running_loop()
+    transport, tracker = await loop.create_datagram_endpoint(
+        _TrackerProtocol, local_addr=('0.0.0.0', 0), family=socket.AF_INET
+    )
     try:
-        total_length = 0
-        info_dict = torrent_info[b'info']
-        if b'files' in info_dict:
-            for file in info_dict[b'files']:
-                total_length += file[b'length']
-        else:
-            total_length += info_dict[b'length']
-    except Exception as E:
-        print(f"Error : {E}")
-        sys.exit(1)
-
-    # Iterate through all trackers and attempt to retrieve peers
-    for url in tracker_url_list:
-        parsed_url = urlparse(url)
-        tracker_ip = parsed_url.hostname
-        tracker_port = parsed_url.port
-        tracker_logger = TRACKER_LOGGER()
-
-        # Step 1: Establish connection with tracker
-        try:
-            connection_id = _make_connection_request(tracker_ip, tracker_port, 1, tracker_logger)
-        except socket.gaierror:
-            print("DNS lookup failed, trying next tracker!")
-            continue
-        except TimeoutError:
-            print("Tracker timed out, trying next tracker!")
-            continue
-        except InvalidAnnounceRespone as inv:
-            print(inv, "Trying next tracker!")
-            continue
-        except Exception as e:
-            print(f"Error: {e}")
-            sys.exit(1)
-
-        # Step 2: Announce to tracker and get peer list
-        try:
-            peers = _make_announce_request(connection_id, info_hash, total_length, tracker_ip, tracker_port, 1, tracker_logger)
-            peer_list.put(peers)
-        except TimeoutError:
-            continue
-        except InvalidAnnounceRespone as inv:
-            print(inv)
-            continue
-        except Exception as e:
-            print(f"Error: {e}")
-            sys.exit(1)
+        results = await asyncio.gather(*(_announce_to_tracker(tracker, url, info_hash, total_length, push_peer)
+                                         for url in tracker_url_list))
+    finally:
+        transport.close()
+
+    return {url: info for url, info in zip(tracker_url_list, results) if info is not None}
 
 # Exported functions
-__all__ = ["get_peers_list", "get_interval_data"]
+__all__ = ["get_peers_list", "get_interval_data", "SwarmInfo", "TrackerError"]
@@ -9,56 +9,65 @@ from utils.details import *
 from typing import List
 import struct
 import hashlib
+import asyncio
+from bitarray import bitarray
+from bitarray.util import zeros
 
-def have_handler(parsed_message: ParsedMessage, verified_pieces: List[bool]) -> List[int]:
+def have_handler(parsed_message: ParsedMessage, verified_pieces: bitarray) -> bitarray:
     """
     Handles a 'have' message to update the state of available pieces.
 
     Args:
         parsed_message (ParsedMessage): The parsed message containing the piece index.
-        verified_pieces (List[bool]): A list indicating which pieces are already verified.
+        verified_pieces (bitarray): A bitmap indicating which pieces are already verified.
 
     Returns:
-        List[int]: List of piece indices that are newly available.
+        bitarray: Bitmap with the announced piece set, if it is not verified locally.
     """
     piece_index, = struct.unpack(">I", parsed_message.payload)  # Big-endian unsigned int
-    result = []
+    result = zeros(len(verified_pieces))
 
     if not verified_pieces[piece_index]:
-        result.append(piece_index)
+        result[piece_index] = True
 
     return result
 
-def bitfield_handler(parsed_message: ParsedMessage, verified_pieces: List[bool]) -> List[int]:
+def bitfield_handler(parsed_message: ParsedMessage, verified_pieces: bitarray) -> bitarray:
     """
     Handles a 'bitfield' message to get all the pieces a peer has.
 
+    The payload already uses the same bit order as bitarray (piece 0 is the
+    high bit of the first byte), so it is loaded directly and masked with
+    C-level bitwise operations.
+
     Args:
         parsed_message (ParsedMessage): The parsed message containing the bitfield payload.
-        verified_pieces (List[bool]): A list indicating which pieces are already verified.
+        verified_pieces (bitarray): A bitmap indicating which pieces are already verified.
 
     Returns:
-        List[int]: List of indices of pieces that the peer has but are not verified locally.
+        bitarray: Bitmap of pieces that the peer has but are not verified locally.
     """
-    payload = parsed_message.payload
     total_pieces = len(verified_pieces)
-    result = []
+    result = bitarray()
+    result.frombytes(parsed_message.payload)
 
-    for byte_index, byte in enumerate(payload):
-        for bit in range(8):
-            piece_index = byte_index * 8 + (7 - bit)
-            if piece_index >= total_pieces:
-                break
-            has_piece = (byte >> bit) & 1
-            if has_piece and not verified_pieces[piece_index]:
-                result.append(piece_index)
+    # Drop the spare bits of the last byte (or pad a short bitfield with zeros)
+    if len(result) > total_pieces:
+        del result[total_pieces:]
+    else:
+        result.extend(zeros(total_pieces - len(result)))
 
+    result &= ~verified_pieces
     return result
 
 def verify_piece_hash(piece_data: bytearray, piece_hash: bytes) -> bool:
     """
     Verifies the SHA-1 hash of a downloaded piece.
 
+    The whole piece is hashed in a single call on a memoryview (no copy), which
+    lets OpenSSL use its fastest SHA-1 path and releases the GIL while hashing,
+    so this can run in worker threads in parallel.
+
     Args:
         piece_data (bytearray): The data of the downloaded piece.
         piece_hash (bytes): The expected SHA-1 hash of the piece.
@@ -66,5 +75,26 @@ def verify_piece_hash(piece_data: bytearray, piece_hash: bytes) -> bool:
     Returns:
         bool: True if the piece hash matches, False otherwise.
     """
-    calculated_hash = hashlib.sha1(piece_data).digest()
+    calculated_hash = hashlib.sha1(memoryview(piece_data)).digest()
     return calculated_hash == piece_hash
+
+async def verify_pieces_batch(pieces: List[bytearray], piece_hashes: List[bytes], executor=None) -> List[bool]:
+    """
+    Verifies several pieces concurrently on a thread pool.
+
+    hashlib releases the GIL while hashing large buffers, so the pieces are
+    hashed in parallel on different cores.
+
+    Args:
+        pieces (List[bytearray]): Data of the downloaded pieces.
+        piece_hashes (List[bytes]): Expected SHA-1 hash of each piece.
+        executor (concurrent.futures.Executor): Thread pool to hash on (default executor if None).
+
+    Returns:
+        List[bool]: For each piece, True if its hash matches.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(executor, verify_piece_hash, piece_data, piece_hash)
+        for piece_data, piece_hash in zip(pieces, piece_hashes)
+    ))
@@ -1,7 +1,13 @@
 from dataclasses import dataclass, asdict, field
-from typing import List, Set
+from typing import List
 import json
-from asyncio import Lock
+from bitarray import bitarray
+from bitarray.util import zeros
+
+try:
+    import orjson      # Optional C JSON serializer, much faster than the json module
+except ImportError:
+    orjson = None
 
 @dataclass
 class ResumeData:
@@ -14,67 +20,102 @@ class ResumeData:
     downloaded: int             # Total bytes downloaded so far
     file_sizes: List[int]       # Sizes of files in the torrent
     mtime: int                  # Last modified time of the torrent files
-    verified_pieces: List[bool] # Boolean list indicating verified (True) or unverified (False) pieces
+    verified_pieces: bitarray   # Bitmap with one bit per piece, set once the piece is verified
     last_active: str            # Timestamp of the last activity (ISO 8601 or custom format)
 
     # Fields that are not included in serialization
-    lock: Lock = field(init=False, repr=False, compare=False)  # Async lock for concurrency control
-    claimed_pieces: Set[int] = field(default_factory=set, init=False, repr=False, compare=False)  
-    # Keeps track of currently claimed pieces (not serialized)
+    claimed_pieces: bitarray = field(init=False, repr=False, compare=False)
+    # Bitmap of pieces currently claimed by a download worker (not serialized)
+    verified_count: int = field(init=False, repr=False, compare=False)
+    # Number of set bits in `verified_pieces`, kept up to date by `mark_verified` (not serialized)
 
     def __post_init__(self):
         """
-        Initializes fields that are excluded from the dataclass constructor.
+        Initializes fields that are excluded from the dataclass constructor,
+        and coerces `verified_pieces` restored from JSON (a hex string, or the
+        list of booleans written by older versions) into a bitarray.
+
+        Raises:
+            ValueError: If `verified_pieces` does not hold exactly `total_pieces` bits.
+        """
+        verified = self.verified_pieces
+        if isinstance(verified, str):
+            bits = bitarray()
+            bits.frombytes(bytes.fromhex(verified))
+            if len(bits) - self.total_pieces not in range(8):
+                raise ValueError(f"verified_pieces has {len(bits)} bits, expected {self.total_pieces}")
+            del bits[self.total_pieces:]   # Drop padding bits of the last byte
+            self.verified_pieces = bits
+        elif not isinstance(verified, bitarray):
+            self.verified_pieces = bitarray(verified)
+
+        # A truncated or stale bitmap would break every bitwise operation with the claim bitmap
+        if len(self.verified_pieces) != self.total_pieces:
+            raise ValueError(f"verified_pieces has {len(self.verified_pieces)} bits, expected {self.total_pieces}")
+
+        self.claimed_pieces = zeros(self.total_pieces)
+        self.verified_count = self.verified_pieces.count()
+
+    def mark_verified(self, piece_index: int) -> bool:
         """
-        self.lock = Lock()
+        Marks a piece as verified and updates `verified_count`.
+        Never awaits, so calls from the event loop need no lock.
+
+        Args:
+            piece_index (int): Index of the verified piece.
+
+        Returns:
+            bool: True if the piece was not verified before.
+        """
+        if self.verified_pieces[piece_index]:
+            return False
+        self.verified_pieces[piece_index] = True
+        self.verified_count += 1
+        return True
 
     def to_json(self, path: str) -> None:
         """
         Serializes the ResumeData object to a JSON file, 
-        excluding non-serializable fields like `lock` and `claimed_pieces`.
+        excluding runtime-only fields like `claimed_pieces` and `verified_count`.
+        The `verified_pieces` bitmap is stored as a hex string.
         """
         data = asdict(self)
-        data.pop('lock', None)             # Remove lock before saving
         data.pop('claimed_pieces', None)   # Remove claimed pieces before saving
-        with open(path, "w") as f:
-            json.dump(data, f, indent=1)
+        data.pop('verified_count', None)   # Derived from verified_pieces on load
+        data['verified_pieces'] = self.verified_pieces.tobytes().hex()
+        if orjson is not None:
+            with open(path, "wb") as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, "w") as f:
+                json.dump(data, f, indent=1)
 
     @classmethod
     def from_json(cls, path: str) -> "ResumeData":
         """
-        Deserializes a JSON file into a ResumeData object, 
-        reinitializing the `lock` and `claimed_pieces` fields.
+        Deserializes a JSON file into a ResumeData object; fields that are
+        not serialized (`claimed_pieces`, `verified_count`) are rebuilt by `__post_init__`.
+
+        Raises:
+            ValueError: If the file is not valid JSON or its bitmap does not match `total_pieces`.
         """
-        with open(path, "r") as f:
-            data = json.load(f)
-        obj = cls(**data)
-        obj.lock = Lock()             # Reinitialize lock
-        obj.claimed_pieces = set()    # Reset claimed pieces
-        return obj
+        if orjson is not None:
+            with open(path, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(path, "r") as f:
+                data = json.load(f)
+
+        return cls(**data)
 
     def verified_to_bytes(self) -> bytes:
         """
-        Converts the `verified_pieces` list of booleans into a compact bytes object.
-        Each bit in a byte represents whether a piece is verified (1) or not (0).
+        Packs the `verified_pieces` bitmap into bytes, 8 pieces per byte,
+        most significant bit first (the BitTorrent bitfield layout).
+        Each bit represents whether a piece is verified (1) or not (0).
 
         Example:
         [True, False, True, True, False, False, False, True] 
         -> 10110001 (0xB1)
         """
-        buf = bytearray()
-        byte = 0
-
-        # Pack bits into bytes (8 pieces per byte)
-        for i, bit in enumerate(self.verified_pieces):
-            byte = (byte << 1) | int(bit)
-            if i % 8 == 7:          # When 8 bits are collected, store the byte
-                buf.append(byte)
-                byte = 0
-
-        # Handle remaining bits if total pieces are not multiple of 8
-        remaining = len(self.verified_pieces) % 8
-        if remaining != 0:
-            byte <<= (8 - remaining)  # Shift to fill remaining bits
-            buf.append(byte)
-
-        return bytes(buf)
+        return self.verified_pieces.tobytes()
@@ -1,30 +1,168 @@
+import os
+import re
+import sys
 import time
+import queue
+import atexit
 import threading
 
+LOG_FILE_ENV = "TORRENT_LOG_FILE"  # If set, log lines are appended to this file instead of stdout
+LOG_FILE_BUFFER_SIZE = 1 << 16    # Write buffer (64 KB) for the log file
+EXIT_DRAIN_TIMEOUT = 1            # Max seconds to wait at exit for queued log lines to be written
+STATS_SEPARATOR = "━" * 40        # Rule printed above and below the progress block
+ANSI_ESCAPE = re.compile(r"\033\[[0-9;]*m")  # Color codes, removed when output is not a terminal
+# Emoji used as message markers (with their variation selectors/joiners and the spaces after them),
+# removed together with the color codes
+EMOJI = re.compile("(?:[\u2139\u2300-\u23FF\u2600-\u27BF\U0001F300-\U0001FAFF][\uFE0F\u200D]*)+ *")
+RATE_LIMIT_INTERVAL = 1.0         # Min seconds between two lines of a chatty message for the same peer
+RATE_LIMIT_MAX_KEYS = 4096        # Rate-limit entries kept before the table is cleared
+
+# Log levels; messages below the current level return before any formatting
+DEBUG = 10      # Chatty per-peer protocol messages
+INFO = 20       # Progress and successful steps
+WARN = 30       # Recoverable problems
+ERROR = 40      # Failures
+
+
+class _LogSink:
+    """
+    Takes log lines from every logger through a queue and writes them from a
+    background thread, so the event loop never blocks on terminal or disk I/O.
+    Lines that queue up while a write is in progress are written together.
+    Color codes and emoji are stripped when the output is not a terminal. A failed
+    write never stops the thread, so lines cannot pile up in the queue.
+    """
+    def __init__(self, stream):
+        self.stream = stream                # stdout, or the log file
+        # Colors and emoji only on a terminal, unless disabled with the NO_COLOR convention
+        self.color = stream.isatty() and not os.environ.get("NO_COLOR")
+        self.queue = queue.SimpleQueue()    # Log lines waiting to be written (None stops the thread)
+        self.thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, text: str):
+        self.queue.put_nowait(text)
+
+    def _drain(self):
+        while True:
+            batch = [self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            stop = batch[-1] is None
+            text = "".join(text for text in batch if text is not None)
+            if not self.color:
+                text = EMOJI.sub("", ANSI_ESCAPE.sub("", text))
+            try:
+                self._write(text)
+            except (OSError, ValueError):
+                pass  # Stream closed or broken (e.g. a closed pipe): drop this batch, keep draining
+            if stop:
+                return
+
+    def _write(self, text: str):
+        try:
+            self.stream.write(text)
+        except UnicodeEncodeError:
+            # The stream's encoding cannot represent some characters (e.g. emoji
+            # on a non-UTF-8 console): write them as replacement characters instead
+            encoding = getattr(self.stream, "encoding", None) or "ascii"
+            self.stream.write(text.encode(encoding, "replace").decode(encoding))
+        self.stream.flush()
+
+    def close(self):
+        """
+        Writes out the lines still queued and stops the writer thread.
+        """
+        self.queue.put_nowait(None)
+        self.thread.join(EXIT_DRAIN_TIMEOUT)
+
+
+def _open_log_stream():
+    log_path = os.environ.get(LOG_FILE_ENV)
+    if log_path:
+        return open(log_path, "a", buffering=LOG_FILE_BUFFER_SIZE, encoding="utf-8", errors="replace")
+    return sys.stdout
+
+
+# Single sink shared by all loggers, so lines keep their order
+_OUT = _LogSink(_open_log_stream())
+atexit.register(_OUT.close)
+
+
+class _Stats:
+    """
+    Download stats shared by every logger, so an update made through one
+    logger is what the stats display shows, whichever logger started it.
+    """
+    def __init__(self):
+        self.start_ns = time.monotonic_ns()  # When logging started (monotonic clock, in ns)
+        self.downloaded = 0                  # Number of pieces downloaded so far
+        self.total = 1                       # Total pieces (defaulted to avoid division errors)
+        self.active_peers = {}               # Currently active peers (IP -> None), in order first seen
+        # No lock: each stat is a single attribute store, which is atomic under the GIL,
+        # and the stats display tolerates reading `downloaded` and `total` a moment apart
+
+
+_STATS = _Stats()
+
+
+# Last time (monotonic) each rate-limited message was written, keyed by (message, peer).
+# No lock: a lost update only lets one extra line through.
+_LAST_EMIT = {}
+
+
+def _should_log(key) -> bool:
+    """
+    Returns True at most once per RATE_LIMIT_INTERVAL for the same key,
+    so a chatty peer produces one line per interval instead of one per message.
+    """
+    now = time.monotonic()
+    if now - _LAST_EMIT.get(key, -RATE_LIMIT_INTERVAL) < RATE_LIMIT_INTERVAL:
+        return False
+    if len(_LAST_EMIT) >= RATE_LIMIT_MAX_KEYS:
+        _LAST_EMIT.clear()  # Peers come and go; drop stale entries instead of growing forever
+    _LAST_EMIT[key] = now
+    return True
+
+
 class Logger:
     """
     Base Logger class to manage common logging functionality.
     Handles download stats and progress visualization in the console.
     """
-    def __init__(self):
-        self.start_time = time.time()  # Time when logging started
-        self.downloaded = 0            # Number of pieces downloaded so far
-        self.total = 1                 # Total pieces (defaulted to avoid division errors)
-        self.active_peers = set()      # Set to store currently active peers
-        self.lock = threading.Lock()   # Lock for thread-safe updates
+    level = INFO    # Minimum level logged, shared by all loggers (see `set_level`)
+    _stats_thread = None                # The one stats display thread, once started
+    _stats_thread_lock = threading.Lock()
+
+    @staticmethod
+    def set_level(level: int):
+        """
+        Set the minimum level logged by every logger.
+        :param level: One of DEBUG, INFO, WARN, ERROR
+        """
+        Logger.level = level
 
     # General logging methods with color-coded output for better visibility
     def success(self, msg: str):
-        print(f"\033[92m✅ {msg}\033[0m")  # Green for success messages
+        if Logger.level > INFO:
+            return
+        _OUT.write(f"\033[92m✅ {msg}\033[0m\n")  # Green for success messages
 
     def error(self, msg: str):
-        print(f"\033[91m❌ {msg}\033[0m")  # Red for error messages
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ {msg}\033[0m\n")  # Red for error messages
 
     def info(self, msg: str):
-        print(f"\033[94mℹ️  {msg}\033[0m")  # Blue for informational messages
+        if Logger.level > INFO:
+            return
+        _OUT.write(f"\033[94mℹ️  {msg}\033[0m\n")  # Blue for informational messages
 
     def warn(self, msg: str):
-        print(f"\033[93m⚠️  {msg}\033[0m")  # Yellow for warnings
+        if Logger.level > WARN:
+            return
+        _OUT.write(f"\033[93m⚠️  {msg}\033[0m\n")  # Yellow for warnings
 
     def update_stats(self, downloaded: int, total: int, peer_ip=None):
         """
@@ -33,91 +171,130 @@ class Logger:
         :param total: Total number of pieces
         :param peer_ip: Optional, IP of the peer contributing to the download
         """
-        with self.lock:
-            self.downloaded = downloaded
-            self.total = total
-            if peer_ip:
-                self.active_peers.add(peer_ip)  # Track unique active peers
+        _STATS.downloaded = downloaded
+        _STATS.total = total
+        if peer_ip:
+            _STATS.active_peers[peer_ip] = None  # Track unique active peers
 
     def display_stats_loop(self, interval=10):
         """
         Periodically display the current download progress and elapsed time.
-        Runs in a daemon thread to avoid blocking the main process.
+        Runs in a daemon thread to avoid blocking the main process. Only the
+        first call starts the thread; later calls, from any logger, do nothing.
         :param interval: Time interval (seconds) to refresh stats
         """
         def loop():
+            monotonic_ns = time.monotonic_ns
             while True:
-                with self.lock:
-                    percent = (self.downloaded / self.total) * 100
-                    elapsed = time.time() - self.start_time
-                    print("\n\033[96m" + "━" * 40)
-                    print(f"📦 Progress: {self.downloaded}/{self.total} pieces ({percent:.2f}%)")
-                    print(f"⏱️  Time Elapsed: {int(elapsed)} sec")
-                    # Uncomment to show active peers:
-                    # print(f"🧑‍🤝‍🧑 Active Peers: {len(self.active_peers)}")
-                    print("━" * 40 + "\033[0m\n")
+                downloaded, total = _STATS.downloaded, _STATS.total
+                percent = (downloaded / total) * 100
+                elapsed = (monotonic_ns() - _STATS.start_ns) // 1_000_000_000
+                # Whole block in one write, in order with the other log lines
+                _OUT.write(f"\n\033[96m{STATS_SEPARATOR}\n"
+                           f"📦 Progress: {downloaded}/{total} pieces ({percent:.2f}%)\n"
+                           f"⏱️  Time Elapsed: {elapsed} sec\n"
+                           # Uncomment to show active peers:
+                           # f"🧑‍🤝‍🧑 Active Peers: {len(_STATS.active_peers)}\n"
+                           f"{STATS_SEPARATOR}\033[0m\n\n")
                 time.sleep(interval)
 
         # Run the loop in a daemon thread
-        threading.Thread(target=loop, daemon=True).start()
+        with Logger._stats_thread_lock:
+            if Logger._stats_thread is None:
+                Logger._stats_thread = threading.Thread(target=loop, name="stats-display", daemon=True)
+                Logger._stats_thread.start()
 
 
 class CONNECTION_LOGGER(Logger):
     """
     Specialized logger for TCP connections and BitTorrent handshakes with peers.
     """
-    def tcp_connection_attempt(self, peer_ip: str, peer_port: int):
-        print(f"\033[95m🌐 Trying TCP connection to {peer_ip}:{peer_port}\033[0m")
+    def tcp_connection_attempt(self, peer: str):
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[95m🌐 Trying TCP connection to {peer}\033[0m\n")
 
-    def tcp_connection_error(self, peer_ip: str, peer_port: int, error: str):
-        print(f"\033[91m❌ Cannot make TCP connection with {peer_ip}:{peer_port}, Error: {error}\033[0m")
+    def tcp_connection_error(self, peer: str, error: str):
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Cannot make TCP connection with {peer}, Error: {error}\033[0m\n")
 
-    def handshake_attempt(self, peer_ip: str, peer_port: int):
-        print(f"\033[95m🔐 Trying BitTorrent handshake with {peer_ip}:{peer_port}\033[0m")
+    def handshake_attempt(self, peer: str):
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[95m🔐 Trying BitTorrent handshake with {peer}\033[0m\n")
 
-    def handshake_success(self, peer_ip: str, peer_port: int):
-        print(f"\033[92m✅ BitTorrent handshake successful with {peer_ip}:{peer_port}\033[0m")
+    def handshake_success(self, peer: str):
+        if Logger.level > INFO:
+            return
+        _OUT.write(f"\033[92m✅ BitTorrent handshake successful with {peer}\033[0m\n")
 
-    def handshake_failure(self, peer_ip: str, peer_port: int):
-        print(f"\033[91m❌ Invalid handshake response from {peer_ip}:{peer_port}\033[0m")
+    def handshake_failure(self, peer: str):
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Invalid handshake response from {peer}\033[0m\n")
 
-    def handshake_error(self, peer_ip: str, peer_port: int, error: str):
-        print(f"\033[91m❌ Handshake failed with {peer_ip}:{peer_port}, Error: {error}\033[0m")
+    def handshake_error(self, peer: str, error: str):
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Handshake failed with {peer}, Error: {error}\033[0m\n")
 
 
 class HANDLE_LOGGER(Logger):
     """
     Specialized logger for handling messages and states during data exchange with peers.
+    Messages a peer can send over and over (choke, have, irrelevant messages)
+    are logged at most once per RATE_LIMIT_INTERVAL for each peer.
     """
-    def waiting_for_unchoke(self, peer_ip: str, peer_port: int):
-        print(f"\033[95m⏳ Waiting for unchoke from {peer_ip}:{peer_port}...\033[0m")
-
-    def unchoke_received(self, peer_ip: str, peer_port: int):
-        print(f"\033[92m✅ {peer_ip}:{peer_port} unchoked us. Proceeding to download.\033[0m")
-
-    def choke_received(self, peer_ip: str, peer_port: int):
-        print(f"\033[93m⚠️ {peer_ip}:{peer_port} is choked, waiting for unchoke...\033[0m")
-
-    def irrelevant_message(self, peer_ip: str, peer_port: int):
-        print(f"\033[93m⚠️ Received irrelevant message from {peer_ip}:{peer_port} while waiting for unchoke.\033[0m")
-
-    def have_message_received(self, peer_ip: str, peer_port: int):
-        print(f"\033[94mℹ️ Received 'have' message from {peer_ip}:{peer_port}\033[0m")
-
-    def bitfield_message_received(self, peer_ip: str, peer_port: int):
-        print(f"\033[94mℹ️ Received 'bitfield' message from {peer_ip}:{peer_port}\033[0m")
-
-    def no_pieces_needed(self, peer_ip: str, peer_port: int):
-        print(f"\033[95m🛑 No pieces needed from {peer_ip}:{peer_port}\033[0m")
-
-    def failed_handling_have(self, peer_ip: str, peer_port: int, error: str):
-        print(f"\033[91m❌ Failed handling 'have' from {peer_ip}:{peer_port}, Error: {error}\033[0m")
-
-    def failed_handling_bitfield(self, peer_ip: str, peer_port: int, error: str):
-        print(f"\033[91m❌ Failed sending 'interested' to {peer_ip}:{peer_port} in response to bitfield, Error: {error}\033[0m")
+    def waiting_for_unchoke(self, peer: str):
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[95m⏳ Waiting for unchoke from {peer}...\033[0m\n")
+
+    def unchoke_received(self, peer: str):
+        if Logger.level > INFO:
+            return
+        _OUT.write(f"\033[92m✅ {peer} unchoked us. Proceeding to download.\033[0m\n")
+
+    def choke_received(self, peer: str):
+        if Logger.level > WARN or not _should_log(("choke_received", peer)):
+            return
+        _OUT.write(f"\033[93m⚠️ {peer} is choked, waiting for unchoke...\033[0m\n")
+
+    def irrelevant_message(self, peer: str):
+        if Logger.level > DEBUG or not _should_log(("irrelevant_message", peer)):
+            return
+        _OUT.write(f"\033[93m⚠️ Received irrelevant message from {peer} while waiting for unchoke.\033[0m\n")
+
+    def have_message_received(self, peer: str):
+        if Logger.level > DEBUG or not _should_log(("have_message_received", peer)):
+            return
+        _OUT.write(f"\033[94mℹ️ Received 'have' message from {peer}\033[0m\n")
+
+    def bitfield_message_received(self, peer: str):
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[94mℹ️ Received 'bitfield' message from {peer}\033[0m\n")
+
+    def no_pieces_needed(self, peer: str):
+        if Logger.level > INFO:
+            return
+        _OUT.write(f"\033[95m🛑 No pieces needed from {peer}\033[0m\n")
+
+    def failed_handling_have(self, peer: str, error: str):
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Failed handling 'have' from {peer}, Error: {error}\033[0m\n")
+
+    def failed_handling_bitfield(self, peer: str, error: str):
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Failed sending 'interested' to {peer} in response to bitfield, Error: {error}\033[0m\n")
     
-    def error_handling_message(self, peer_ip: str, peer_port: int, error: str):
-        print(f"\033[91m❌ Error handling message from {peer_ip}:{peer_port}, Error: {error}\033[0m")
+    def error_handling_message(self, peer: str, error: str):
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Error handling message from {peer}, Error: {error}\033[0m\n")
 
 
 class TRACKER_LOGGER(Logger):
@@ -126,28 +303,46 @@ class TRACKER_LOGGER(Logger):
     Logs connection attempts, responses, and peer lists.
     """
     def connection_request_sent(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[94mℹ️ Connection request sent to tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[94mℹ️ Connection request sent to tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def connection_response_received(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[92m✅ Connection response received from tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[92m✅ Connection response received from tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def announce_request_sent(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[94mℹ️ Announce request sent to tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[94mℹ️ Announce request sent to tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def announce_response_received(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[92m✅ Announce response received from tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > DEBUG:
+            return
+        _OUT.write(f"\033[92m✅ Announce response received from tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def tracker_timeout(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[91m❌ Timeout while connecting to tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Timeout while connecting to tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def invalid_connection_response(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[91m❌ Invalid connection response from tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Invalid connection response from tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def invalid_announce_response(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[91m❌ Invalid announce response from tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Invalid announce response from tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def peers_received(self, tracker_ip: str, tracker_port: int, num_peers: int):
-        print(f"\033[94mℹ️ Received {num_peers} peers from tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > INFO:
+            return
+        _OUT.write(f"\033[94mℹ️ Received {num_peers} peers from tracker: {tracker_ip}:{tracker_port}\033[0m\n")
 
     def failed_to_connect(self, tracker_ip: str, tracker_port: int):
-        print(f"\033[91m❌ Failed to connect to tracker: {tracker_ip}:{tracker_port}\033[0m")
+        if Logger.level > ERROR:
+            return
+        _OUT.write(f"\033[91m❌ Failed to connect to tracker: {tracker_ip}:{tracker_port}\033[0m\n")
@@ -1,6 +1,17 @@
-import struct
 from utils.details import *
 
+# Length byte (19) followed by the protocol string, the first 20 bytes of every handshake
+HANDSHAKE_PREFIX = b"\x13BitTorrent protocol"
+HANDSHAKE_LENGTH = 68                     # Prefix + 8 reserved bytes + info_hash + peer_id
+HANDSHAKE_INFO_HASH = slice(28, 48)       # Position of the info_hash, after the reserved bytes
+
+# Message ids (BitTorrent specification), for branching on `msg.id` directly at the call site
+MSG_CHOKE = 0
+MSG_UNCHOKE = 1
+MSG_HAVE = 4
+MSG_BITFIELD = 5
+MSG_PIECE = 7
+
 def is_handshake(packet: bytes, info_hash: bytes) -> bool:
     """
     Checks if the given packet is a valid BitTorrent handshake packet.
@@ -21,26 +32,16 @@ def is_handshake(packet: bytes, info_hash: bytes) -> bool:
     Returns:
         bool: True if the packet is a valid handshake, otherwise False
     """
-    # A valid handshake packet must be exactly 68 bytes
-    if len(packet) != 68:
-        return False
-
-    # Unpack the packet: 
-    # >     : big-endian
-    # B     : 1-byte length of protocol string
-    # 19s   : 19-byte protocol string
-    # 8x    : skip 8 reserved bytes
-    # 20s   : 20-byte info_hash
-    # 20s   : 20-byte peer_id
-    len_resp, msg_resp, info_hash_resp, peer_id_resp = struct.unpack(">B19s8x20s20s", packet)
-
-    # Validate the components of the handshake
-    if len_resp != 19 or msg_resp != b'BitTorrent protocol' or info_hash_resp != info_hash:
-        return False
-
-    return True
+    # A valid handshake packet must be exactly 68 bytes. The prefix and
+    # info_hash (after the 8 reserved bytes) are compared in place, without
+    # unpacking the packet into separate fields.
+    return (len(packet) == HANDSHAKE_LENGTH
+            and packet[:20] == HANDSHAKE_PREFIX
+            and packet[HANDSHAKE_INFO_HASH] == info_hash)
 
 
+# Deprecated: the predicates below are kept for compatibility. Hot paths
+# compare `msg.id` with the MSG_* constants at the call site instead.
 def is_have(msg: ParsedMessage) -> bool:
     """
     Checks if the message is a 'have' message.